@@ -1,8 +1,10 @@
 from fastapi import Request, HTTPException, Depends
-from database import users_collection
+from user_status import is_user_active
+from auth_cache import JWKSCache, VerifiedTokenCache
 from keycloak.exceptions import KeycloakError
 from keycloak import KeycloakOpenID
-import os
+from jwcrypto.common import JWException, base64url_decode, json_decode
+import asyncio, os
 
 KEYCLOAK_ISSUER = os.getenv("KEYCLOAK_ISSUER")
 KEYCLOAK_SERVER_URL = os.getenv("KEYCLOAK_SERVER_URL")
@@ -22,10 +24,27 @@ def get_keycloak_openid():
     )
   return _keycloak_openid
 
+jwks_cache = JWKSCache(lambda: get_keycloak_openid().a_certs())
+verified_tokens = VerifiedTokenCache()
+
+def token_kid(token: str):
+  header = token.split(".", 1)[0]
+  return json_decode(base64url_decode(header)).get("kid")
+
+async def decode_token(token: str):
+  key = await jwks_cache.get_key(token_kid(token))
+  if key is None:
+    raise JWException("Nieznany klucz podpisu tokenu")
+  # Weryfikacja podpisu to czysta kryptografia - poza pętlą zdarzeń
+  return await asyncio.to_thread(get_keycloak_openid().decode_token, token, True, key=key)
+
 async def verify_token(token: str):
+  cached = verified_tokens.get(token)
+  if cached is not None:
+    return cached
+
   try:
-    keycloak_openid = get_keycloak_openid()
-    token_info = keycloak_openid.decode_token(token, validate=True)
+    token_info = await decode_token(token)
 
     if token_info.get("aud") != KEYCLOAK_AUDIENCE:
       raise HTTPException(status_code=401, detail="Token nie jest przeznaczony dla tej aplikacji")
@@ -37,9 +56,12 @@ async def verify_token(token: str):
       raise HTTPException(status_code=401, detail="Token nie zawiera daty wygaśnięcia (exp)")
     if not token_info.get("sub"):
       raise HTTPException(status_code=401, detail="Token nie zawiera identyfikatora użytkownika (sub)")
+    verified_tokens.put(token, token_info)
     return token_info
         
-  except KeycloakError as e:
+  except HTTPException:
+    raise
+  except (KeycloakError, JWException) as e:
     raise HTTPException(status_code=401, detail="Nieprawidłowy lub wygasły token")
   except ValueError as e:
     raise HTTPException(status_code=401, detail="Nieprawidłowy format tokenu")
@@ -61,8 +83,7 @@ async def get_current_user(request: Request):
     raise HTTPException(status_code=401, detail="Token nie zawiera identyfikatora użytkownika")
 
   try:
-    user = await users_collection.find_one({"keycloak_id": user_id})
-    if user and not user.get("is_active", True):
+    if not await is_user_active(user_id):
       raise HTTPException(status_code=403, detail="Konto użytkownika zostało dezaktywowane")
 
   except HTTPException:
@@ -0,0 +1,79 @@
+from collections import OrderedDict
+from jwcrypto import jwk
+import asyncio, hashlib, os, time
+
+JWKS_REFRESH_INTERVAL = int(os.getenv("JWKS_REFRESH_INTERVAL", "3600"))
+JWKS_MIN_REFRESH_INTERVAL = int(os.getenv("JWKS_MIN_REFRESH_INTERVAL", "30"))
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+
+class JWKSCache:
+  # Klucze publiczne realmu trzymane lokalnie (po kid). Nieznany kid oznacza rotację
+  # kluczy w Keycloak - wtedy pobieramy JWKS ponownie, ale nie częściej niż co
+  # JWKS_MIN_REFRESH_INTERVAL, żeby tokeny z losowym kid nie zasypywały Keycloaka.
+  def __init__(self, fetch_certs):
+    self._fetch_certs = fetch_certs
+    self._keys = {}
+    self._refreshing = None
+    self.fetched_at = None
+
+  async def _load(self):
+    certs = await self._fetch_certs()
+    self._keys = {
+      cert["kid"]: jwk.JWK(**cert)
+      for cert in certs.get("keys", [])
+      if cert.get("kid") and cert.get("use", "sig") == "sig"
+    }
+    self.fetched_at = time.monotonic()
+
+  async def refresh(self):
+    if self._refreshing is None:
+      self._refreshing = asyncio.ensure_future(self._load())
+      self._refreshing.add_done_callback(lambda _: setattr(self, "_refreshing", None))
+    await asyncio.shield(self._refreshing)
+
+  async def get_key(self, kid):
+    key = self._keys.get(kid)
+    if key is None and (self.fetched_at is None or time.monotonic() - self.fetched_at >= JWKS_MIN_REFRESH_INTERVAL):
+      await self.refresh()
+      key = self._keys.get(kid)
+    return key
+
+  async def run_refresh(self):
+    while True:
+      try:
+        await self.refresh()
+      except Exception as e:
+        print(f"JWKS refresh failed: {e}")
+      await asyncio.sleep(JWKS_REFRESH_INTERVAL)
+
+class VerifiedTokenCache:
+  # Tokeny już zweryfikowane (podpis i claimy), ważne do swojego exp. Kluczem jest
+  # skrót tokenu, więc w pamięci nie trzymamy samych tokenów.
+  def __init__(self, max_size=TOKEN_CACHE_SIZE):
+    self.max_size = max_size
+    self._entries = OrderedDict()
+
+  @staticmethod
+  def _key(token):
+    return hashlib.sha256(token.encode()).digest()
+
+  def get(self, token):
+    key = self._key(token)
+    token_info = self._entries.get(key)
+    if token_info is None:
+      return None
+    if token_info["exp"] <= time.time():
+      del self._entries[key]
+      return None
+    self._entries.move_to_end(key)
+    return token_info
+
+  def put(self, token, token_info):
+    key = self._key(token)
+    self._entries[key] = token_info
+    self._entries.move_to_end(key)
+    while len(self._entries) > self.max_size:
+      self._entries.popitem(last=False)
+
+  def __len__(self):
+    return len(self._entries)
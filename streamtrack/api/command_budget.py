@@ -0,0 +1,72 @@
+# Sprawdza, ile komend Mongo wysyła każda trasa zapisu (cel: jedna na żądanie).
+# Wymaga działającego Mongo (MONGO_URL); Keycloak nie jest potrzebny - użytkownik
+# jest podstawiony za get_current_user, a wywołania Admin API Keycloak są pomijane.
+#   MONGO_URL=mongodb://localhost:27017 python command_budget.py
+# Kod wyjścia 1, gdy któraś trasa przekroczy budżet.
+import os, sys, uuid
+
+os.environ["MONGO_COMMAND_COUNT"] = "true"
+
+from fastapi.testclient import TestClient
+from mongo_commands import COMMANDS_HEADER
+from auth import get_current_user
+from keycloak_service import keycloak_service
+from main import app
+
+# (nazwa, metoda, ścieżka, body, oczekiwany status, budżet komend). Ponad jedną komendę:
+#   register - sprawdzenie username/email przed utworzeniem konta w Keycloak (nie da się go cofnąć)
+#   promote - odczyt keycloak_id i ról przed zmianą ról w Keycloak
+#   deactivate/activate - zdarzenie w user_events unieważniające cache statusu na replikach
+def scenario(movie_id, username):
+  return [
+    ("create note", "POST", "/api/notes", {"movie_id": movie_id, "content": "x", "media_type": "movie"}, 200, 1),
+    ("update note", "PUT", "/api/notes/{note_id}", {"content": "y"}, 200, 1),
+    ("update foreign note", "PUT", "/api/notes/000000000000000000000000", {"content": "y"}, 404, 1),
+    ("delete note", "DELETE", "/api/notes/{note_id}", None, 200, 1),
+    ("add to watchlist", "POST", "/api/watchlist", {"movie_id": movie_id, "title": "x", "media_type": "movie"}, 200, 1),
+    ("add duplicate to watchlist", "POST", "/api/watchlist", {"movie_id": movie_id, "title": "x", "media_type": "movie"}, 409, 1),
+    ("remove from watchlist", "DELETE", f"/api/watchlist/{movie_id}", None, 200, 1),
+    ("first profile read", "GET", "/api/profile", None, 200, 1),
+    ("update profile", "PUT", "/api/profile", {"avatar_url": "/static/avatars/x.png"}, 200, 1),
+    ("register", "POST", "/api/register", {"username": username, "email": f"{username}@example.com", "password": "x"}, 200, 2),
+    ("promote to admin", "POST", "/api/promote", {"user_id": "{registered_id}", "role": "admin"}, 200, 2),
+    ("deactivate user", "DELETE", "/api/users/{registered_id}", None, 200, 2),
+    ("activate user", "PUT", "/api/users/{registered_id}/activate", None, 200, 2),
+  ]
+
+async def skip_keycloak(*args, **kwargs):
+  return str(uuid.uuid4())
+
+def fill(value, context):
+  if isinstance(value, dict):
+    return {k: v.format(**context) if isinstance(v, str) else v for k, v in value.items()}
+  return value
+
+def main():
+  user_id = str(uuid.uuid4())
+  app.dependency_overrides[get_current_user] = lambda: {
+    "user_id": user_id, "username": "budget", "email": None, "roles": ["user", "admin"], "token_info": {}
+  }
+  for method in ("create_user", "assign_role", "remove_role", "update_user"):
+    setattr(keycloak_service, method, skip_keycloak)
+  username = f"budget_{uuid.uuid4().hex[:12]}"
+  failures = 0
+  context = {}
+  with TestClient(app) as client:
+    for name, method, path, body, status, budget in scenario(str(uuid.uuid4()), username):
+      response = client.request(method, path.format(**context), json=fill(body, context))
+      if method == "POST" and path == "/api/notes":
+        context["note_id"] = response.json().get("_id")
+      if path == "/api/register":
+        context["registered_id"] = response.json().get("_id")
+      commands = response.headers.get(COMMANDS_HEADER, "?")
+      used = int(commands.split()[0]) if commands[0].isdigit() else None
+      ok = response.status_code == status and used is not None and used <= budget
+      failures += not ok
+      print(f"{'ok' if ok else 'FAIL':<5} {name:<28} status={response.status_code} commands={commands} budget={budget}")
+    from database import users_collection
+    client.portal.call(users_collection.delete_many, {"$or": [{"keycloak_id": user_id}, {"username": username}]})
+  return 1 if failures else 0
+
+if __name__ == "__main__":
+  sys.exit(main())
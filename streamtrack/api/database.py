@@ -3,8 +3,10 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+from mongo_commands import event_listeners
+
 MONGO_URL = os.getenv("MONGO_URL", "mongodb://mongo:27017")
-client = motor.motor_asyncio.AsyncIOMotorClient(MONGO_URL)
+client = motor.motor_asyncio.AsyncIOMotorClient(MONGO_URL, event_listeners=event_listeners())
 db = client["notes_db"]
 notes_collection = db["notes"]
 users_collection = db["users"]
\ No newline at end of file
@@ -0,0 +1,95 @@
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from pymongo import ASCENDING
+from bson import ObjectId
+from datetime import datetime, timezone
+import csv, io, json, os
+
+# Dokumentów na jedno getMore - większa partia to mniej round tripów, ale więcej pamięci
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "500"))
+# Wiersze buforowane do jednego kawałka odpowiedzi
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+EXPORT_FORMATS = {
+  "ndjson": "application/x-ndjson",
+  "csv": "text/csv; charset=utf-8",
+}
+
+def export_value(value):
+  if isinstance(value, ObjectId):
+    return str(value)
+  if isinstance(value, datetime):
+    return value.isoformat()
+  return value
+
+def naive_utc(value):
+  # Mongo przechowuje daty w UTC, a Motor zwraca je bez strefy - tak samo traktujemy granice
+  if value is not None and value.tzinfo is not None:
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+  return value
+
+def date_range(field, date_from=None, date_to=None):
+  date_from, date_to = naive_utc(date_from), naive_utc(date_to)
+  if date_from and date_to and date_from > date_to:
+    raise HTTPException(status_code=400, detail="date_from must not be later than date_to")
+  bounds = {}
+  if date_from:
+    bounds["$gte"] = date_from
+  if date_to:
+    bounds["$lte"] = date_to
+  return {field: bounds} if bounds else {}
+
+class CsvRows:
+  # csv.writer pisze do bufora, który po każdym wierszu oddajemy i czyścimy
+  def __init__(self, columns):
+    self._buffer = io.StringIO()
+    self._writer = csv.writer(self._buffer)
+    self.columns = columns
+
+  def header(self):
+    return self.row(self.columns)
+
+  def row(self, values):
+    self._writer.writerow(values)
+    line = self._buffer.getvalue()
+    self._buffer.seek(0)
+    self._buffer.truncate()
+    return line
+
+def export_line(document, columns, export_format, csv_rows):
+  values = [export_value(document.get(column)) for column in columns]
+  if export_format == "csv":
+    return csv_rows.row(["|".join(map(str, v)) if isinstance(v, list) else v for v in values])
+  return json.dumps(dict(zip(columns, values)), ensure_ascii=False) + "\n"
+
+async def export_lines(cursor, columns, export_format):
+  csv_rows = CsvRows(columns)
+  chunk = [csv_rows.header()] if export_format == "csv" else []
+  size = sum(map(len, chunk))
+  try:
+    async for document in cursor:
+      line = export_line(document, columns, export_format, csv_rows)
+      chunk.append(line)
+      size += len(line)
+      if size >= EXPORT_CHUNK_SIZE:
+        yield "".join(chunk)
+        chunk, size = [], 0
+    if chunk:
+      yield "".join(chunk)
+  finally:
+    # Klient mógł przerwać pobieranie - zwalniamy kursor po stronie serwera
+    await cursor.close()
+
+def export_response(collection, query, columns, sort_field, export_format, filename):
+  if export_format not in EXPORT_FORMATS:
+    raise HTTPException(status_code=400, detail=f"Unsupported format, expected one of: {', '.join(EXPORT_FORMATS)}")
+  cursor = (
+    collection.find(query, {column: 1 for column in columns})
+    .sort([(sort_field, ASCENDING), ("_id", ASCENDING)])
+    .batch_size(EXPORT_BATCH_SIZE)
+  )
+  return StreamingResponse(
+    export_lines(cursor, columns, export_format),
+    media_type=EXPORT_FORMATS[export_format],
+    headers={"Content-Disposition": f'attachment; filename="{filename}.{export_format}"'}
+  )
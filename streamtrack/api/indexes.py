@@ -0,0 +1,108 @@
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import ConnectionFailure, PyMongoError
+from database import db
+import asyncio, sys
+
+INDEX_RETRY_DELAY = 30
+
+# Indeksy zakładane przy starcie API. create_indexes jest idempotentne - istniejący
+# indeks o tej samej specyfikacji zostaje bez zmian.
+INDEXES = {
+  # Indeksy stron (pagination.py) kończą się na (pole sortowania, _id) - jeden indeks
+  # obsługuje obie kolejności sortowania
+  "notes": [
+    IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], name="user_created"),
+    IndexModel([("user_id", ASCENDING), ("movie_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)],
+               name="user_movie_created"),
+    IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)], name="created"),
+  ],
+  "watchlist_items": [
+    IndexModel([("user_id", ASCENDING), ("movie_id", ASCENDING)], name="user_movie_unique", unique=True),
+    IndexModel([("user_id", ASCENDING), ("added_at", DESCENDING), ("_id", DESCENDING)], name="user_added"),
+  ],
+  "users": [
+    IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)], name="created"),
+    IndexModel([("keycloak_id", ASCENDING)], name="keycloak_id_unique", unique=True),
+    IndexModel([("username", ASCENDING)], name="username_unique", unique=True),
+    # Profile zakładane przy pierwszym logowaniu nie mają emaila (null) - unikalność
+    # tylko dla niepustych napisów
+    IndexModel([("email", ASCENDING)], name="email_unique", unique=True,
+               partialFilterExpression={"email": {"$gt": ""}}),
+  ],
+}
+
+# Zapytania tras (z przykładowymi wartościami) sprawdzane przez explain()
+SAMPLE_ID = "00000000-0000-0000-0000-000000000000"
+NEWEST = {"created_at": -1, "_id": -1}
+ROUTE_QUERIES = {
+  "GET /notes": {"find": "notes", "filter": {"user_id": SAMPLE_ID}, "sort": NEWEST},
+  "GET /notes?sort=oldest": {"find": "notes", "filter": {"user_id": SAMPLE_ID}, "sort": {"created_at": 1, "_id": 1}},
+  "GET /notes/media/{media_id}": {"find": "notes", "filter": {"user_id": SAMPLE_ID, "movie_id": "1"}, "sort": NEWEST},
+  "GET /admin/notes": {"find": "notes", "filter": {}, "sort": NEWEST},
+  "GET /admin/users": {"distinct": "notes", "key": "user_id"},
+  "GET /watchlist": {"find": "watchlist_items", "filter": {"user_id": SAMPLE_ID}, "sort": {"added_at": -1, "_id": -1}},
+  "GET /watchlist/check/{movie_id}": {"find": "watchlist_items", "filter": {"user_id": SAMPLE_ID, "movie_id": "1"}},
+  "DELETE /watchlist/{movie_id}": {"find": "watchlist_items", "filter": {"movie_id": "1", "user_id": SAMPLE_ID}},
+  "get_current_user": {"find": "users", "filter": {"keycloak_id": SAMPLE_ID}, "projection": {"is_active": 1}},
+  "GET /users": {"find": "users", "filter": {}, "sort": NEWEST},
+  "POST /register": {"find": "users", "filter": {"$or": [{"username": "sample"}, {"email": "sample@example.com"}]}},
+}
+
+async def ensure_indexes(collections=None):
+  # Zwraca kolekcje, których nie udało się obsłużyć z powodu braku połączenia z Mongo
+  unreachable = []
+  for collection_name in collections or INDEXES:
+    try:
+      await db[collection_name].create_indexes(INDEXES[collection_name])
+    except ConnectionFailure as e:
+      unreachable.append(collection_name)
+      print(f"Creating indexes on {collection_name} failed, Mongo unreachable: {e}")
+    except PyMongoError as e:
+      # Np. duplikaty w istniejących danych albo indeks o tej nazwie z inną specyfikacją
+      print(f"Creating indexes on {collection_name} failed: {e}")
+  return unreachable
+
+async def run_ensure_indexes():
+  # Zadanie w tle przy starcie API: ponawia, dopóki Mongo jest niedostępne
+  pending = await ensure_indexes()
+  while pending:
+    await asyncio.sleep(INDEX_RETRY_DELAY)
+    pending = await ensure_indexes(pending)
+
+def plan_stages(plan):
+  stages = []
+  if isinstance(plan, dict):
+    if "stage" in plan:
+      stages.append((plan["stage"], plan.get("indexName")))
+    for value in plan.values():
+      stages += plan_stages(value)
+  elif isinstance(plan, list):
+    for value in plan:
+      stages += plan_stages(value)
+  return stages
+
+async def check_index_usage():
+  # Dla każdej trasy: czy plan zwycięski obywa się bez skanu całej kolekcji i sortowania w pamięci
+  report = {}
+  for route, command in ROUTE_QUERIES.items():
+    explained = await db.command({"explain": command, "verbosity": "queryPlanner"})
+    stages = plan_stages(explained["queryPlanner"]["winningPlan"])
+    report[route] = {
+      # SORT w planie oznacza sortowanie w pamięci zamiast odczytu w kolejności indeksu
+      "indexed": not any(stage in ("COLLSCAN", "SORT") for stage, _ in stages),
+      "indexes": sorted({index for _, index in stages if index}),
+      "stages": [stage for stage, _ in stages],
+    }
+  return report
+
+async def main():
+  # python indexes.py - zakłada indeksy i sprawdza plany zapytań tras (kod 1 przy COLLSCAN/SORT)
+  await ensure_indexes()
+  report = await check_index_usage()
+  for route, result in report.items():
+    status = "ok" if result["indexed"] else "UNINDEXED"
+    print(f"{status:<9} {route:<32} {', '.join(result['indexes']) or '-'}  [{' > '.join(result['stages'])}]")
+  return 0 if all(result["indexed"] for result in report.values()) else 1
+
+if __name__ == "__main__":
+  sys.exit(asyncio.run(main()))
@@ -1,7 +1,13 @@
-import httpx, asyncio, json, os
+import httpx, asyncio, json, os, time
 from fastapi import HTTPException
 from typing import Dict, Any, List
 
+KEYCLOAK_TIMEOUT = float(os.getenv("KEYCLOAK_TIMEOUT", "10"))
+KEYCLOAK_MAX_CONNECTIONS = int(os.getenv("KEYCLOAK_MAX_CONNECTIONS", "20"))
+# Token odświeżamy z wyprzedzeniem, żeby nie wygasł w trakcie zapytania
+ADMIN_TOKEN_REFRESH_MARGIN = int(os.getenv("ADMIN_TOKEN_REFRESH_MARGIN", "30"))
+ROLE_CACHE_TTL = int(os.getenv("KEYCLOAK_ROLE_CACHE_TTL", "300"))
+
 class KeycloakService:
 	def __init__(self):
 		self.keycloak_url = os.getenv("KEYCLOAK_SERVER_URL", "http://keycloak:8080")
@@ -9,31 +15,92 @@ class KeycloakService:
 		self.admin_username = os.getenv("KEYCLOAK_ADMIN", "admin")
 		self.admin_password = os.getenv("KEYCLOAK_ADMIN_PASSWORD", "admin")
 		self.client_id = "admin-cli"
-		
+		self.client = httpx.AsyncClient(
+			timeout=KEYCLOAK_TIMEOUT,
+			limits=httpx.Limits(max_connections=KEYCLOAK_MAX_CONNECTIONS, max_keepalive_connections=KEYCLOAK_MAX_CONNECTIONS)
+		)
+		self._access_token = None
+		self._access_expires_at = 0
+		self._refresh_token = None
+		self._refresh_expires_at = 0
+		self._token_request = None
+		self._roles = {}
+
+	async def close(self):
+		await self.client.aclose()
+
+	def _store_token(self, token_data):
+		now = time.monotonic()
+		self._access_token = token_data["access_token"]
+		self._access_expires_at = now + token_data.get("expires_in", 60) - ADMIN_TOKEN_REFRESH_MARGIN
+		self._refresh_token = token_data.get("refresh_token")
+		self._refresh_expires_at = now + token_data.get("refresh_expires_in", 0) - ADMIN_TOKEN_REFRESH_MARGIN
+		return self._access_token
+
+	async def _request_token(self):
+		data = {
+			"client_id": self.client_id,
+			"username": self.admin_username,
+			"password": self.admin_password,
+			"grant_type": "password"
+		}
+		if self._refresh_token and time.monotonic() < self._refresh_expires_at:
+			data = {"client_id": self.client_id, "refresh_token": self._refresh_token, "grant_type": "refresh_token"}
+
+		try:
+			response = await self.client.post(
+				f"{self.keycloak_url}/realms/master/protocol/openid-connect/token",
+				data=data,
+				headers={"Content-Type": "application/x-www-form-urlencoded"}
+			)
+			if response.status_code == 400 and data["grant_type"] == "refresh_token":
+				# Sesja admina zakończona po stronie Keycloak - logujemy się od nowa
+				self._refresh_token = None
+				return await self._request_token()
+			response.raise_for_status()
+			return self._store_token(response.json())
+		except httpx.RequestError as exc:
+			raise HTTPException(status_code=503, detail=f"Could not connect to Keycloak: {exc}")
+		except KeyError:
+			raise HTTPException(status_code=500, detail="Invalid token response from Keycloak")
+
 	async def get_admin_token(self):
-		async with httpx.AsyncClient() as client:
-			try:
-				response = await client.post(
-					f"{self.keycloak_url}/realms/master/protocol/openid-connect/token",
-					data={
-						"client_id": self.client_id,
-						"username": self.admin_username,
-						"password": self.admin_password,
-						"grant_type": "password"
-					},
-					headers={"Content-Type": "application/x-www-form-urlencoded"}
-				)
-				response.raise_for_status()
-				token_data = response.json()
-				return token_data["access_token"]
-			except httpx.RequestError as exc:
-				raise HTTPException(status_code=503, detail=f"Could not connect to Keycloak: {exc}")
-			except KeyError:
-				raise HTTPException(status_code=500, detail="Invalid token response from Keycloak")
+		if self._access_token and time.monotonic() < self._access_expires_at:
+			return self._access_token
 
-	async def create_user(self, username, email, password, first_name=None, last_name=None):
+		# Jedno odświeżenie naraz - pozostali czekają na jego wynik
+		if self._token_request is None:
+			self._token_request = asyncio.ensure_future(self._request_token())
+			self._token_request.add_done_callback(lambda _: setattr(self, "_token_request", None))
+		return await asyncio.shield(self._token_request)
+
+	def _drop_token(self, token):
+		if self._access_token == token:
+			self._access_token = None
+
+	async def _admin_request(self, method, path, **kwargs):
 		token = await self.get_admin_token()
-		
+		url = f"{self.keycloak_url}/admin/realms/{self.realm}{path}"
+		response = await self.client.request(method, url, headers={"Authorization": f"Bearer {token}"}, **kwargs)
+		if response.status_code == 401:
+			# Token unieważniony przed czasem (np. restart Keycloak) - jedna ponowna próba
+			self._drop_token(token)
+			token = await self.get_admin_token()
+			response = await self.client.request(method, url, headers={"Authorization": f"Bearer {token}"}, **kwargs)
+		return response
+
+	async def get_role(self, role_name):
+		cached = self._roles.get(role_name)
+		if cached and time.monotonic() < cached[1]:
+			return cached[0]
+
+		role_response = await self._admin_request("GET", f"/roles/{role_name}")
+		role_response.raise_for_status()
+		role_data = role_response.json()
+		self._roles[role_name] = (role_data, time.monotonic() + ROLE_CACHE_TTL)
+		return role_data
+
+	async def create_user(self, username, email, password, first_name=None, last_name=None):
 		user_data = {
 			"username": username,
 			"email": email,
@@ -51,55 +118,38 @@ class KeycloakService:
 		if last_name:
 			user_data["lastName"] = last_name
 			
-		async with httpx.AsyncClient() as client:
-			try:
-				response = await client.post(
-					f"{self.keycloak_url}/admin/realms/{self.realm}/users",
-					json=user_data,
-					headers={
-						"Authorization": f"Bearer {token}",
-						"Content-Type": "application/json"
-					}
-				)
+		try:
+			response = await self._admin_request("POST", "/users", json=user_data)
+			
+			if response.status_code == 409:
+				raise HTTPException(status_code=409, detail="User already exists")
+				
+			response.raise_for_status()
+			location = response.headers.get("Location")
+			if location:
+				user_id = location.split("/")[-1]
+				return user_id
+			else:
+				return await self.get_user_id_by_username(username)
 				
-				if response.status_code == 409:
-					raise HTTPException(status_code=409, detail="User already exists")
-					
-				response.raise_for_status()
-				location = response.headers.get("Location")
-				if location:
-					user_id = location.split("/")[-1]
-					return user_id
-				else:
-					return await self.get_user_id_by_username(username)
-					
-			except httpx.RequestError as exc:
-				raise HTTPException(status_code=503, detail=f"Could not connect to Keycloak: {exc}")
+		except httpx.RequestError as exc:
+			raise HTTPException(status_code=503, detail=f"Could not connect to Keycloak: {exc}")
 
 	async def get_user_id_by_username(self, username):
-		token = await self.get_admin_token()
-		
-		async with httpx.AsyncClient() as client:
-			try:
-				response = await client.get(
-					f"{self.keycloak_url}/admin/realms/{self.realm}/users",
-					params={"username": username, "exact": "true"},
-					headers={"Authorization": f"Bearer {token}"}
-				)
-				response.raise_for_status()
-				users = response.json()
-				
-				if not users:
-					raise HTTPException(status_code=404, detail="User not found")
-					
-				return users[0]["id"]
+		try:
+			response = await self._admin_request("GET", "/users", params={"username": username, "exact": "true"})
+			response.raise_for_status()
+			users = response.json()
+			
+			if not users:
+				raise HTTPException(status_code=404, detail="User not found")
 				
-			except httpx.RequestError as exc:
-				raise HTTPException(status_code=503, detail=f"Could not connect to Keycloak: {exc}")
+			return users[0]["id"]
+			
+		except httpx.RequestError as exc:
+			raise HTTPException(status_code=503, detail=f"Could not connect to Keycloak: {exc}")
 
 	async def update_user(self, user_id, email=None, first_name=None, last_name=None):
-		token = await self.get_admin_token()
-		
 		user_data = {}
 		if email:
 			user_data["email"] = email
@@ -111,89 +161,45 @@ class KeycloakService:
 		if not user_data:
 			return True
 			
-		async with httpx.AsyncClient() as client:
-			try:
-				response = await client.put(
-					f"{self.keycloak_url}/admin/realms/{self.realm}/users/{user_id}",
-					json=user_data,
-					headers={
-						"Authorization": f"Bearer {token}",
-						"Content-Type": "application/json"
-					}
-				)
-				response.raise_for_status()
-				return True
-				
-			except httpx.RequestError as exc:
-				raise HTTPException(status_code=503, detail=f"Could not connect to Keycloak: {exc}")
+		try:
+			response = await self._admin_request("PUT", f"/users/{user_id}", json=user_data)
+			response.raise_for_status()
+			return True
+			
+		except httpx.RequestError as exc:
+			raise HTTPException(status_code=503, detail=f"Could not connect to Keycloak: {exc}")
 
-	async def assign_role(self, user_id, role_name):
-		token = await self.get_admin_token()
+	async def _change_role(self, method, user_id, role_name):
+		role_data = await self.get_role(role_name)
+		response = await self._admin_request(method, f"/users/{user_id}/role-mappings/realm", json=[role_data])
+		if response.status_code == 404:
+			# Rola mogła zostać odtworzona z nowym id - pobieramy ją ponownie
+			self._roles.pop(role_name, None)
+			role_data = await self.get_role(role_name)
+			response = await self._admin_request(method, f"/users/{user_id}/role-mappings/realm", json=[role_data])
+		response.raise_for_status()
+		return True
 
-		async with httpx.AsyncClient() as client:
-			try:
-				role_response = await client.get(
-					f"{self.keycloak_url}/admin/realms/{self.realm}/roles/{role_name}",
-					headers={"Authorization": f"Bearer {token}"}
-				)
-				role_response.raise_for_status()
-				role_data = role_response.json()
-			
-				assign_response = await client.post(
-					f"{self.keycloak_url}/admin/realms/{self.realm}/users/{user_id}/role-mappings/realm",
-					json=[role_data],
-					headers={
-						"Authorization": f"Bearer {token}",
-						"Content-Type": "application/json"
-					}
-				)
-				assign_response.raise_for_status()
-				return True
-				
-			except httpx.RequestError as exc:
-				raise HTTPException(status_code=503, detail=f"Could not connect to Keycloak: {exc}")
+	async def assign_role(self, user_id, role_name):
+		try:
+			return await self._change_role("POST", user_id, role_name)
+		except httpx.RequestError as exc:
+			raise HTTPException(status_code=503, detail=f"Could not connect to Keycloak: {exc}")
 
 	async def remove_role(self, user_id, role_name):
-		token = await self.get_admin_token()
-		
-		async with httpx.AsyncClient() as client:
-			try:
-				role_response = await client.get(
-					f"{self.keycloak_url}/admin/realms/{self.realm}/roles/{role_name}",
-					headers={"Authorization": f"Bearer {token}"}
-				)
-				role_response.raise_for_status()
-				role_data = role_response.json()
-
-				remove_response = await client.request(
-					method="DELETE",
-					url=f"{self.keycloak_url}/admin/realms/{self.realm}/users/{user_id}/role-mappings/realm",
-					json=[role_data],
-					headers={
-						"Authorization": f"Bearer {token}",
-						"Content-Type": "application/json"
-					}
-				)
-				remove_response.raise_for_status()
-				return True
-				
-			except httpx.RequestError as exc:
-				raise HTTPException(status_code=503, detail=f"Could not connect to Keycloak: {exc}")
+		try:
+			return await self._change_role("DELETE", user_id, role_name)
+		except httpx.RequestError as exc:
+			raise HTTPException(status_code=503, detail=f"Could not connect to Keycloak: {exc}")
 
 	async def get_user_roles(self, user_id):
-		token = await self.get_admin_token()
-		
-		async with httpx.AsyncClient() as client:
-			try:
-				response = await client.get(
-					f"{self.keycloak_url}/admin/realms/{self.realm}/users/{user_id}/role-mappings/realm",
-					headers={"Authorization": f"Bearer {token}"}
-				)
-				response.raise_for_status()
-				roles = response.json()
-				return [role["name"] for role in roles]
-				
-			except httpx.RequestError as exc:
-				raise HTTPException(status_code=503, detail=f"Could not connect to Keycloak: {exc}")
+		try:
+			response = await self._admin_request("GET", f"/users/{user_id}/role-mappings/realm")
+			response.raise_for_status()
+			roles = response.json()
+			return [role["name"] for role in roles]
+			
+		except httpx.RequestError as exc:
+			raise HTTPException(status_code=503, detail=f"Could not connect to Keycloak: {exc}")
 
 keycloak_service = KeycloakService()
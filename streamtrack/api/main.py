@@ -1,15 +1,36 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+from contextlib import asynccontextmanager
 from pathlib import Path
-import os
+import asyncio, os
+
+from auth import jwks_cache
+from pagination import NEXT_CURSOR_HEADER
+from mongo_commands import MONGO_COMMAND_COUNT, count_commands
+from user_status import run_user_events_listener
+from keycloak_service import keycloak_service
+from indexes import run_ensure_indexes
 
 from routes.notes import router as notes_router
 from routes.admin import router as admin_router
 from routes.watchlist import router as watchlist_router
 from routes.users import router as users_router
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+  # Indeksy w tle - niedostępne Mongo nie może blokować startu (liveness probe)
+  background = [
+    asyncio.create_task(run_ensure_indexes()),
+    asyncio.create_task(jwks_cache.run_refresh()),
+    asyncio.create_task(run_user_events_listener()),
+  ]
+  yield
+  for task in background:
+    task.cancel()
+  await keycloak_service.close()
+
+app = FastAPI(lifespan=lifespan)
 
 origins_env = os.getenv("CORS_ORIGINS")
 if origins_env:
@@ -23,8 +44,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"], 
     allow_headers=["*"], 
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
+if MONGO_COMMAND_COUNT:
+  app.middleware("http")(count_commands)
+
 app.include_router(notes_router, prefix="/api", tags=["Notes"])
 app.include_router(watchlist_router, prefix="/api", tags=["Watchlist"])
 app.include_router(admin_router, prefix="/api", tags=["Admin"])
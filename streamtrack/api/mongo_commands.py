@@ -0,0 +1,38 @@
+from collections import Counter
+from contextvars import ContextVar
+from pymongo import monitoring
+import os
+
+# Liczenie komend Mongo wysłanych podczas obsługi jednego żądania. Motor wykonuje
+# operacje w puli wątków, ale z kopią kontekstu - licznik żądania jest tam widoczny.
+MONGO_COMMAND_COUNT = os.getenv("MONGO_COMMAND_COUNT", "false").lower() == "true"
+COMMANDS_HEADER = "X-Mongo-Commands"
+
+request_commands = ContextVar("request_commands", default=None)
+
+class CommandCounter(monitoring.CommandListener):
+  def started(self, event):
+    commands = request_commands.get()
+    if commands is not None:
+      commands[event.command_name] += 1
+
+  def succeeded(self, event):
+    pass
+
+  def failed(self, event):
+    pass
+
+def event_listeners():
+  return [CommandCounter()] if MONGO_COMMAND_COUNT else []
+
+async def count_commands(request, call_next):
+  # Middleware: liczba komend trafia do nagłówka, np. "2 (find=1, insert=1)"
+  commands = Counter()
+  token = request_commands.set(commands)
+  try:
+    response = await call_next(request)
+  finally:
+    request_commands.reset(token)
+  details = ", ".join(f"{name}={count}" for name, count in sorted(commands.items()))
+  response.headers[COMMANDS_HEADER] = f"{sum(commands.values())} ({details})" if details else "0"
+  return response
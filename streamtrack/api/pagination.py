@@ -0,0 +1,61 @@
+from fastapi import HTTPException, Response
+from pymongo import ASCENDING, DESCENDING
+from bson import ObjectId
+from datetime import datetime
+import base64, json, os
+
+PAGE_SIZE_DEFAULT = int(os.getenv("PAGE_SIZE_DEFAULT", "50"))
+PAGE_SIZE_MAX = int(os.getenv("PAGE_SIZE_MAX", "200"))
+# Lista w treści odpowiedzi jak dotąd, kursor następnej strony w nagłówku
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def sort_options(field):
+  # Każda opcja musi mieć indeks kończący się na (field, _id) - patrz indexes.py
+  return {"newest": (field, DESCENDING), "oldest": (field, ASCENDING)}
+
+def encode_cursor(sort, value, object_id):
+  payload = {"s": sort, "v": value.isoformat() if isinstance(value, datetime) else value, "id": str(object_id)}
+  return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor, sort):
+  try:
+    payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    value = payload["v"]
+    if value is not None:
+      value = datetime.fromisoformat(value)
+    object_id = ObjectId(payload["id"])
+  except Exception:
+    raise HTTPException(status_code=400, detail="Invalid cursor")
+  if payload.get("s") != sort:
+    raise HTTPException(status_code=400, detail="Cursor does not match the sort order")
+  return value, object_id
+
+def after_filter(field, direction, value, object_id):
+  # Dokumenty po (value, _id) w kolejności sortowania. Brak pola (null) Mongo sortuje
+  # przed wszystkimi datami - na końcu przy DESC, na początku przy ASC.
+  if direction == DESCENDING:
+    if value is None:
+      return {field: None, "_id": {"$lt": object_id}}
+    return {"$or": [{field: {"$lt": value}}, {field: value, "_id": {"$lt": object_id}}, {field: None}]}
+  if value is None:
+    return {"$or": [{field: None, "_id": {"$gt": object_id}}, {field: {"$ne": None}}]}
+  return {"$or": [{field: {"$gt": value}}, {field: value, "_id": {"$gt": object_id}}]}
+
+async def fetch_page(collection, query, response: Response, options, sort, after=None, limit=PAGE_SIZE_DEFAULT):
+  if sort not in options:
+    raise HTTPException(status_code=400, detail=f"Unsupported sort, expected one of: {', '.join(options)}")
+  field, direction = options[sort]
+  limit = max(1, min(limit, PAGE_SIZE_MAX))
+
+  if after:
+    keyset = after_filter(field, direction, *decode_cursor(after, sort))
+    query = {"$and": [query, keyset]} if query else keyset
+
+  cursor = collection.find(query).sort([(field, direction), ("_id", direction)]).limit(limit + 1)
+  documents = await cursor.to_list(length=limit + 1)
+
+  if len(documents) > limit:
+    documents = documents[:limit]
+    last = documents[-1]
+    response.headers[NEXT_CURSOR_HEADER] = encode_cursor(sort, last.get(field), last["_id"])
+  return documents
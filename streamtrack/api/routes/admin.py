@@ -1,16 +1,25 @@
-from fastapi import APIRouter, Depends
-from database import notes_collection
+from fastapi import APIRouter, Depends, Response
+from database import notes_collection, users_collection
 from auth import require_role
 from schemas import NoteResponse 
-from typing import List
+from typing import List, Optional
+from pagination import PAGE_SIZE_DEFAULT, fetch_page, sort_options
+from export import date_range, export_response
 from datetime import datetime 
 
 router = APIRouter()
 
+NOTE_SORTS = sort_options("created_at")
+NOTE_EXPORT_COLUMNS = ["_id", "user_id", "movie_id", "media_type", "content", "created_at", "updated_at"]
+USER_EXPORT_COLUMNS = [
+  "_id", "keycloak_id", "username", "email", "first_name", "last_name",
+  "roles", "is_active", "created_at", "updated_at"
+]
+
 @router.get("/admin/notes", response_model=List[NoteResponse])
-async def get_all_notes(current_user_data: dict = Depends(require_role("admin"))):
-  cursor = notes_collection.find()
-  notes = await cursor.to_list(length=None) 
+async def get_all_notes(response: Response, limit: int = PAGE_SIZE_DEFAULT, after: Optional[str] = None, sort: str = "newest",
+                        current_user_data: dict = Depends(require_role("admin"))):
+  notes = await fetch_page(notes_collection, {}, response, NOTE_SORTS, sort, after, limit)
     
   processed_notes = []
   for note_item in notes:
@@ -31,3 +40,26 @@ async def get_users_with_notes_activity(current_user_data: dict = Depends(requir
     return {"message": "No users have created notes yet.", "users": []}
         
   return {"users_with_notes_activity": user_ids_with_notes}
+
+
+@router.get("/admin/notes/export")
+async def export_notes(format: str = "ndjson", user_id: Optional[str] = None, media_type: Optional[str] = None,
+                       date_from: Optional[datetime] = None, date_to: Optional[datetime] = None,
+                       current_user_data: dict = Depends(require_role("admin"))):
+  query = date_range("created_at", date_from, date_to)
+  if user_id:
+    query["user_id"] = user_id
+  if media_type:
+    query["media_type"] = media_type
+  return export_response(notes_collection, query, NOTE_EXPORT_COLUMNS, "created_at", format, "notes")
+
+@router.get("/admin/users/export")
+async def export_users(format: str = "ndjson", user_id: Optional[str] = None, is_active: Optional[bool] = None,
+                       date_from: Optional[datetime] = None, date_to: Optional[datetime] = None,
+                       current_user_data: dict = Depends(require_role("admin"))):
+  query = date_range("created_at", date_from, date_to)
+  if user_id:
+    query["keycloak_id"] = user_id
+  if is_active is not None:
+    query["is_active"] = is_active
+  return export_response(users_collection, query, USER_EXPORT_COLUMNS, "created_at", format, "users")
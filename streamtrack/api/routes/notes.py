@@ -1,14 +1,18 @@
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List
+from fastapi import APIRouter, HTTPException, Depends, Response
+from typing import List, Optional
 from bson import ObjectId
 from datetime import datetime
 from pymongo import ReturnDocument 
 from database import notes_collection
-from schemas import NoteCreate, NoteResponse, NoteUpdate
+from schemas import NoteCreate, NoteResponse, NoteUpdate, response_projection
 from auth import get_current_user
+from pagination import PAGE_SIZE_DEFAULT, fetch_page, sort_options
 
 router = APIRouter()
 
+NOTE_SORTS = sort_options("created_at")
+NOTE_PROJECTION = response_projection(NoteResponse)
+
 @router.post("/notes", response_model=NoteResponse)
 async def create_note(note: NoteCreate, current_user_data: dict = Depends(get_current_user)):
   note_dict = note.model_dump() 
@@ -21,23 +25,20 @@ async def create_note(note: NoteCreate, current_user_data: dict = Depends(get_cu
     result = await notes_collection.insert_one(note_dict)
   except Exception as e:
     raise HTTPException(status_code=500, detail="Failed to insert note into database")
-    
-  created_note_from_db = await notes_collection.find_one({"_id": result.inserted_id})
-    
-  if not created_note_from_db:
-    raise HTTPException(status_code=500, detail="Failed to create and retrieve note from database")
 
-  response_data = dict(created_note_from_db)
-  response_data["_id"] = str(response_data["_id"]) 
+  response_data = dict(note_dict)
+  response_data["_id"] = str(result.inserted_id)
   return response_data
 
 @router.get("/notes", response_model=List[NoteResponse])
-async def get_notes(current_user_data: dict = Depends(get_current_user)):
+async def get_notes(response: Response, limit: int = PAGE_SIZE_DEFAULT, after: Optional[str] = None, sort: str = "newest",
+                    current_user_data: dict = Depends(get_current_user)):
   user_id_str = current_user_data["user_id"]
 
   try:
-    cursor = notes_collection.find({"user_id": user_id_str})
-    notes_from_db = await cursor.to_list(length=None) 
+    notes_from_db = await fetch_page(notes_collection, {"user_id": user_id_str}, response, NOTE_SORTS, sort, after, limit)
+  except HTTPException:
+    raise
   except Exception as e:
     raise HTTPException(status_code=500, detail="Error fetching notes from database")
 
@@ -112,33 +113,29 @@ async def update_note(note_id: str, note_update: NoteUpdate, current_user_data:
   updated_note_doc = await notes_collection.find_one_and_update(
     {"_id": obj_id, "user_id": user_id_str},
     {"$set": update_data},
+    projection=NOTE_PROJECTION,
     return_document=ReturnDocument.AFTER 
   )
 
   if not updated_note_doc:
-    existing_note = await notes_collection.find_one({"_id": obj_id})
-    if not existing_note:
-      raise HTTPException(status_code=404, detail="Note not found")
-    else: 
-      raise HTTPException(status_code=403, detail="Access denied or no changes made")
+    raise HTTPException(status_code=404, detail="Note not found or access denied")
     
   updated_note_doc["_id"] = str(updated_note_doc["_id"])
   if "created_at" not in updated_note_doc:
-    original_note = await notes_collection.find_one({"_id": obj_id, "user_id": user_id_str})
-    if original_note and "created_at" in original_note:
-      updated_note_doc["created_at"] = original_note["created_at"]
-    else: 
-      updated_note_doc["created_at"] = datetime.min
+    updated_note_doc["created_at"] = datetime.min
 
   return updated_note_doc
 
 @router.get("/notes/media/{media_id}", response_model=List[NoteResponse])
-async def get_notes_for_media_item(media_id: str, current_user_data: dict = Depends(get_current_user)):
+async def get_notes_for_media_item(media_id: str, response: Response, limit: int = PAGE_SIZE_DEFAULT, after: Optional[str] = None,
+                                   sort: str = "newest", current_user_data: dict = Depends(get_current_user)):
   user_id_str = current_user_data["user_id"]
 
   try:
-    cursor = notes_collection.find({"user_id": user_id_str, "movie_id": media_id})
-    notes_from_db = await cursor.to_list(length=None) 
+    query = {"user_id": user_id_str, "movie_id": media_id}
+    notes_from_db = await fetch_page(notes_collection, query, response, NOTE_SORTS, sort, after, limit)
+  except HTTPException:
+    raise
   except Exception as e:
     raise HTTPException(status_code=500, detail="Error fetching notes for media from database")
 
@@ -1,16 +1,23 @@
-from fastapi import APIRouter, HTTPException, Depends, UploadFile, File
-from typing import List
+from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Response
+from typing import List, Optional
 from datetime import datetime
 from pathlib import Path
 from database import db, users_collection
-from schemas import UserCreate, UserUpdate, UserResponse, UserPromoteRequest, UserRole
+from schemas import UserCreate, UserUpdate, UserResponse, UserPromoteRequest, UserRole, response_projection
 from auth import get_current_user, require_role
 from keycloak_service import keycloak_service
+from user_status import publish_user_status
+from pagination import PAGE_SIZE_DEFAULT, fetch_page, sort_options
 from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 import os, uuid 
 
 router = APIRouter()
 
+USER_SORTS = sort_options("created_at")
+USER_PROJECTION = response_projection(UserResponse)
+
 @router.post("/register", response_model=UserResponse, operation_id="user_register")
 async def register_user(user_data: UserCreate):
   try:
@@ -47,11 +54,13 @@ async def register_user(user_data: UserCreate):
       "updated_at": None
     }
     
-    result = await users_collection.insert_one(user_doc)
-    created_user = await users_collection.find_one({"_id": result.inserted_id})
+    try:
+      result = await users_collection.insert_one(user_doc)
+    except DuplicateKeyError:
+      raise HTTPException(status_code=409, detail="User with this username or email already exists")
 
-    response_data = dict(created_user)
-    response_data["_id"] = str(response_data["_id"])
+    response_data = dict(user_doc)
+    response_data["_id"] = str(result.inserted_id)
     return response_data
     
   except HTTPException:
@@ -60,10 +69,10 @@ async def register_user(user_data: UserCreate):
     raise HTTPException(status_code=500, detail=f"Failed to register user: {str(e)}")
 
 @router.get("/users", response_model=List[UserResponse], operation_id="admin_get_all_users")
-async def get_all_users(current_user_data: dict = Depends(require_role("admin"))):
+async def get_all_users(response: Response, limit: int = PAGE_SIZE_DEFAULT, after: Optional[str] = None, sort: str = "newest",
+                        current_user_data: dict = Depends(require_role("admin"))):
   try:
-    cursor = users_collection.find()
-    users = await cursor.to_list(length=None)
+    users = await fetch_page(users_collection, {}, response, USER_SORTS, sort, after, limit)
     
     processed_users = []
     for user in users:
@@ -74,34 +83,44 @@ async def get_all_users(current_user_data: dict = Depends(require_role("admin"))
       
     return processed_users
     
+  except HTTPException:
+    raise
   except Exception as e:
     raise HTTPException(status_code=500, detail=f"Failed to fetch users: {str(e)}")
 
 @router.get("/profile", response_model=UserResponse, operation_id="user_get_profile")
 async def get_user_profile(current_user_data: dict = Depends(get_current_user)):
   try:
-    user = await users_collection.find_one({"keycloak_id": current_user_data["user_id"]})
-    
+    user_doc = {
+      "keycloak_id": current_user_data["user_id"],
+      "username": f"user_{current_user_data['user_id'][:8]}", 
+      "email": None,  
+      "first_name": None,
+      "last_name": None,
+      "roles": [UserRole.USER],
+      "is_active": True,
+      "avatar_url": None,
+      "created_at": datetime.now(),
+      "updated_at": None
+    }
+
+    # Odczyt i ewentualne utworzenie profilu przy pierwszym logowaniu w jednym zapytaniu
+    try:
+      user = await users_collection.find_one_and_update(
+        {"keycloak_id": current_user_data["user_id"]},
+        {"$setOnInsert": user_doc},
+        projection=USER_PROJECTION,
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+      )
+    except DuplicateKeyError:
+      # Równoległe pierwsze logowanie - profil założyło inne żądanie
+      user = await users_collection.find_one({"keycloak_id": current_user_data["user_id"]}, USER_PROJECTION)
+    except Exception as create_error:
+      raise HTTPException(status_code=500, detail=f"Failed to create user profile: {str(create_error)}")
+
     if not user:
-      try:
-        user_doc = {
-          "keycloak_id": current_user_data["user_id"],
-          "username": f"user_{current_user_data['user_id'][:8]}", 
-          "email": None,  
-          "first_name": None,
-          "last_name": None,
-          "roles": [UserRole.USER],
-          "is_active": True,
-          "avatar_url": None,
-          "created_at": datetime.now(),
-          "updated_at": None
-        }
-        
-        result = await users_collection.insert_one(user_doc)
-        user = await users_collection.find_one({"_id": result.inserted_id})
-        
-      except Exception as create_error:
-        raise HTTPException(status_code=500, detail=f"Failed to create user profile: {str(create_error)}")
+      raise HTTPException(status_code=500, detail="Failed to create user profile")
     
     response_data = dict(user)
     response_data["_id"] = str(response_data["_id"])
@@ -115,11 +134,6 @@ async def get_user_profile(current_user_data: dict = Depends(get_current_user)):
 @router.put("/profile", response_model=UserResponse, operation_id="user_update_profile")
 async def update_user_profile(user_update: UserUpdate, current_user_data: dict = Depends(get_current_user)):
   try:
-    user = await users_collection.find_one({"keycloak_id": current_user_data["user_id"]})
-    
-    if not user:
-      raise HTTPException(status_code=404, detail="User not found")
-    
     update_data = {}
     keycloak_update_data = {}
     
@@ -139,28 +153,47 @@ async def update_user_profile(user_update: UserUpdate, current_user_data: dict =
       update_data["avatar_url"] = user_update.avatar_url
     
     if not update_data:
+      user = await users_collection.find_one({"keycloak_id": current_user_data["user_id"]}, USER_PROJECTION)
+      if not user:
+        raise HTTPException(status_code=404, detail="User not found")
       response_data = dict(user)
       response_data["_id"] = str(response_data["_id"])
       return response_data
       
-    if keycloak_update_data:
-      await keycloak_service.update_user(
-        user_id=current_user_data["user_id"],
-        **keycloak_update_data
-      )
-    
     update_data["updated_at"] = datetime.now()
     
-    await users_collection.update_one(
+    # Najpierw Mongo: Keycloak aktualizujemy tylko dla istniejącego profilu. Stan sprzed
+    # zmiany pozwala zbudować odpowiedź i cofnąć zapis, gdy Keycloak odmówi.
+    previous_user = await users_collection.find_one_and_update(
       {"keycloak_id": current_user_data["user_id"]},
-      {"$set": update_data}
+      {"$set": update_data},
+      projection=USER_PROJECTION,
+      return_document=ReturnDocument.BEFORE
     )
-    
-    updated_user = await users_collection.find_one({"keycloak_id": current_user_data["user_id"]})
-    response_data = dict(updated_user)
+    if not previous_user:
+      raise HTTPException(status_code=404, detail="User not found")
+
+    if keycloak_update_data:
+      try:
+        await keycloak_service.update_user(
+          user_id=current_user_data["user_id"],
+          **keycloak_update_data
+        )
+      except Exception:
+        await users_collection.update_one(
+          {"keycloak_id": current_user_data["user_id"]},
+          {"$set": {field: previous_user.get(field) for field in update_data}}
+        )
+        raise
+
+    response_data = {**previous_user, **update_data}
     response_data["_id"] = str(response_data["_id"])
     return response_data
     
+  except HTTPException:
+    raise
+  except DuplicateKeyError:
+    raise HTTPException(status_code=409, detail="Email is already in use")
   except Exception as e:
     raise HTTPException(status_code=500, detail=f"Failed to update user profile: {str(e)}")
 
@@ -254,15 +287,16 @@ async def get_user_by_id(user_id: str, current_user_data: dict = Depends(require
 @router.delete("/users/{user_id}", operation_id="admin_deactivate_user")
 async def deactivate_user(user_id: str, current_user_data: dict = Depends(require_role("admin"))):
   try:
-    user = await users_collection.find_one({"_id": ObjectId(user_id)})
+    user = await users_collection.find_one_and_update(
+      {"_id": ObjectId(user_id)},
+      {"$set": {"is_active": False, "updated_at": datetime.now()}},
+      projection={"username": 1, "keycloak_id": 1}
+    )
     
     if not user:
       raise HTTPException(status_code=404, detail="User not found")
 
-    await users_collection.update_one(
-      {"_id": ObjectId(user_id)},
-      {"$set": {"is_active": False, "updated_at": datetime.now()}}
-    )
+    await publish_user_status(user["keycloak_id"])
     
     return {"message": f"User {user['username']} has been deactivated"}
     
@@ -272,15 +306,16 @@ async def deactivate_user(user_id: str, current_user_data: dict = Depends(requir
 @router.put("/users/{user_id}/activate", operation_id="admin_activate_user")
 async def activate_user(user_id: str, current_user_data: dict = Depends(require_role("admin"))):
   try:
-    user = await users_collection.find_one({"_id": ObjectId(user_id)})
+    user = await users_collection.find_one_and_update(
+      {"_id": ObjectId(user_id)},
+      {"$set": {"is_active": True, "updated_at": datetime.now()}},
+      projection={"username": 1, "keycloak_id": 1}
+    )
     
     if not user:
       raise HTTPException(status_code=404, detail="User not found")
 
-    await users_collection.update_one(
-      {"_id": ObjectId(user_id)},
-      {"$set": {"is_active": True, "updated_at": datetime.now()}}
-    )
+    await publish_user_status(user["keycloak_id"])
     
     return {"message": f"User {user['username']} has been activated"}
     
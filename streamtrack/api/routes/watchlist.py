@@ -1,12 +1,16 @@
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List
+from fastapi import APIRouter, HTTPException, Depends, Response
+from typing import List, Optional
 from datetime import datetime
+from pymongo.errors import DuplicateKeyError
 from database import db 
 from schemas import WatchlistItemCreate, WatchlistItemResponse
 from auth import get_current_user
+from pagination import PAGE_SIZE_DEFAULT, fetch_page, sort_options
 
 router = APIRouter()
 
+WATCHLIST_SORTS = sort_options("added_at")
+
 def get_watchlist_collection():
 	return db.watchlist_items 
 
@@ -16,35 +20,30 @@ async def add_to_watchlist(item: WatchlistItemCreate, current_user_data: dict =
 	item_dict = item.model_dump()
 	item_dict["user_id"] = current_user_data["user_id"]
 	item_dict["added_at"] = datetime.now()
-	existing_item = await watchlist_collection.find_one({
-		"user_id": item_dict["user_id"],
-		"movie_id": item_dict["movie_id"]
-	})
-	if existing_item:
-		raise HTTPException(status_code=409, detail="Item already in watchlist")
 
+	# Duplikaty odrzuca unikalny indeks (user_id, movie_id) - patrz indexes.py
 	try:
 		result = await watchlist_collection.insert_one(item_dict)
+	except DuplicateKeyError:
+		raise HTTPException(status_code=409, detail="Item already in watchlist")
 	except Exception as e:
 		raise HTTPException(status_code=500, detail=f"Failed to add item to watchlist: {e}")
 
-	created_item_from_db = await watchlist_collection.find_one({"_id": result.inserted_id})
-
-	if not created_item_from_db:
-		raise HTTPException(status_code=500, detail="Failed to create and retrieve watchlist item")
-	
-	response_data = dict(created_item_from_db)
-	response_data["_id"] = str(response_data["_id"])
+	response_data = dict(item_dict)
+	response_data["_id"] = str(result.inserted_id)
 	return response_data
 
 @router.get("/watchlist", response_model=List[WatchlistItemResponse])
-async def get_watchlist(current_user_data: dict = Depends(get_current_user)):
+async def get_watchlist(response: Response, limit: int = PAGE_SIZE_DEFAULT, after: Optional[str] = None, sort: str = "newest",
+                        current_user_data: dict = Depends(get_current_user)):
 	watchlist_collection = get_watchlist_collection()
 	user_id_str = current_user_data["user_id"]
 
 	try:
-		cursor = watchlist_collection.find({"user_id": user_id_str})
-		watchlist_items_from_db = await cursor.to_list(length=None)
+		query = {"user_id": user_id_str}
+		watchlist_items_from_db = await fetch_page(watchlist_collection, query, response, WATCHLIST_SORTS, sort, after, limit)
+	except HTTPException:
+		raise
 	except Exception as e:
 		raise HTTPException(status_code=500, detail=f"Error fetching watchlist: {e}")
 
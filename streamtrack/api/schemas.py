@@ -76,3 +76,7 @@ class WatchlistItemResponse(WatchlistItemBase):
   class Config:
     from_attributes = True
     populate_by_name = True
+
+def response_projection(model):
+  # Projekcja Mongo z pól modelu odpowiedzi (po aliasach, np. _id)
+  return {field.alias or name: 1 for name, field in model.model_fields.items()}
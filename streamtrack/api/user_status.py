@@ -0,0 +1,95 @@
+from collections import OrderedDict
+from pymongo import CursorType
+from pymongo.errors import CollectionInvalid
+from datetime import datetime
+from database import db, users_collection
+import asyncio, os, time
+
+# Maksymalny czas, przez jaki replika może używać nieaktualnego statusu, gdy
+# powiadomienie z kanału do niej nie dotrze
+USER_STATUS_TTL = int(os.getenv("USER_STATUS_TTL", "30"))
+USER_STATUS_CACHE_SIZE = int(os.getenv("USER_STATUS_CACHE_SIZE", "10000"))
+USER_EVENTS_SIZE = 1024 * 1024
+USER_EVENTS_RETRY_DELAY = 5
+
+user_events_collection = db["user_events"]
+
+class UserStatusCache:
+  # keycloak_id -> (is_active, wygasa). Generacja rośnie przy każdej inwalidacji, więc
+  # odczyt z bazy rozpoczęty przed dezaktywacją nie nadpisze jej starym statusem.
+  def __init__(self, ttl=USER_STATUS_TTL, max_size=USER_STATUS_CACHE_SIZE):
+    self.ttl = ttl
+    self.max_size = max_size
+    self.generation = 0
+    self._entries = OrderedDict()
+
+  def get(self, keycloak_id):
+    entry = self._entries.get(keycloak_id)
+    if entry is None:
+      return None
+    is_active, expires_at = entry
+    if expires_at <= time.monotonic():
+      del self._entries[keycloak_id]
+      return None
+    self._entries.move_to_end(keycloak_id)
+    return is_active
+
+  def put(self, keycloak_id, is_active, generation):
+    if generation != self.generation:
+      return
+    self._entries[keycloak_id] = (is_active, time.monotonic() + self.ttl)
+    self._entries.move_to_end(keycloak_id)
+    while len(self._entries) > self.max_size:
+      self._entries.popitem(last=False)
+
+  def invalidate(self, keycloak_id):
+    self.generation += 1
+    self._entries.pop(keycloak_id, None)
+
+  def clear(self):
+    self.generation += 1
+    self._entries.clear()
+
+user_status = UserStatusCache()
+
+async def is_user_active(keycloak_id: str):
+  is_active = user_status.get(keycloak_id)
+  if is_active is None:
+    generation = user_status.generation
+    user = await users_collection.find_one({"keycloak_id": keycloak_id}, {"is_active": 1})
+    is_active = user.get("is_active", True) if user else True
+    user_status.put(keycloak_id, is_active, generation)
+  return is_active
+
+async def publish_user_status(keycloak_id: str):
+  # Lokalnie od razu, pozostałym replikom przez kanał user_events
+  user_status.invalidate(keycloak_id)
+  await user_events_collection.insert_one({"keycloak_id": keycloak_id, "created_at": datetime.now()})
+
+async def ensure_user_events():
+  # Kolekcja ograniczona (capped) - kursor tailable działa też na Mongo bez replica setu
+  try:
+    await db.create_collection("user_events", capped=True, size=USER_EVENTS_SIZE)
+  except CollectionInvalid:
+    pass
+
+async def run_user_events_listener():
+  last_id = None
+  while True:
+    try:
+      await ensure_user_events()
+      query = {"_id": {"$gt": last_id}} if last_id else {}
+      cursor = user_events_collection.find(query, cursor_type=CursorType.TAILABLE_AWAIT)
+      while cursor.alive:
+        async for event in cursor:
+          last_id = event["_id"]
+          user_status.invalidate(event["keycloak_id"])
+      # Pusty kanał zamyka kursor od razu - czekamy na pierwsze zdarzenie
+      await asyncio.sleep(1)
+    except asyncio.CancelledError:
+      raise
+    except Exception as e:
+      # Zdarzenia mogły przepaść - porzucamy cały cache, resztę ogranicza TTL
+      user_status.clear()
+      print(f"User events listener failed: {e}")
+      await asyncio.sleep(USER_EVENTS_RETRY_DELAY)
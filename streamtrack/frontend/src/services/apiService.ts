@@ -23,7 +23,7 @@ export interface NoteUpdateData {
 }
 
 export const getNotes = async (): Promise<Note[]> => {
-  return apiCall('/api/notes');
+  return apiCallAllPages('/api/notes');
 };
 
 export const createNote = async (note: NoteIn): Promise<Note> => {
@@ -48,7 +48,7 @@ export const updateNote = async (noteId: string, noteUpdateData: NoteUpdateData)
 
 export const getNotesByMovieId = async (movieId: string): Promise<Note[]> => {
   try {
-    return await apiCall(`/api/notes/media/${movieId}`);
+    return await apiCallAllPages(`/api/notes/media/${movieId}`);
   } catch (error: any) {
     if (error.message?.includes('404')) {
       return [];
@@ -57,7 +57,7 @@ export const getNotesByMovieId = async (movieId: string): Promise<Note[]> => {
   }
 };
 
-export const apiCall = async (endpoint: string, options: RequestInit = {}): Promise<any> => {
+const apiFetch = async (endpoint: string, options: RequestInit = {}): Promise<Response> => {
   const url = `${API_URL}${endpoint}`;  
   const defaultHeaders: Record<string, string> = {};
 
@@ -90,9 +90,31 @@ export const apiCall = async (endpoint: string, options: RequestInit = {}): Prom
     throw new Error(errorMessage);
   }
 
+  return response;
+};
+
+export const apiCall = async (endpoint: string, options: RequestInit = {}): Promise<any> => {
+  const response = await apiFetch(endpoint, options);
+
   if (response.status === 204) {
     return {};
   }
 
   return response.json();
 };
+
+// Listy są stronicowane - kursor następnej strony przychodzi w nagłówku X-Next-Cursor
+export const apiCallAllPages = async (endpoint: string): Promise<any[]> => {
+  const items: any[] = [];
+  const separator = endpoint.includes('?') ? '&' : '?';
+  let cursor: string | null = null;
+
+  do {
+    const pageEndpoint: string = cursor ? `${endpoint}${separator}after=${encodeURIComponent(cursor)}` : endpoint;
+    const response = await apiFetch(pageEndpoint);
+    items.push(...(await response.json()));
+    cursor = response.headers.get('X-Next-Cursor');
+  } while (cursor);
+
+  return items;
+};
@@ -1,4 +1,4 @@
-import { apiCall } from './apiService';
+import { apiCall, apiCallAllPages } from './apiService';
 
 export interface User {
   id?: string;
@@ -44,7 +44,7 @@ export const userService = {
   },
 
   async getAllUsers(): Promise<User[]> {
-    return apiCall('/api/users');
+    return apiCallAllPages('/api/users');
   },
 
   async getProfile(): Promise<User> {
@@ -1,4 +1,4 @@
-import { apiCall } from './apiService';
+import { apiCall, apiCallAllPages } from './apiService';
 
 export interface WatchlistItem {
   id: string;
@@ -17,7 +17,7 @@ export interface WatchlistItemIn {
 }
 
 export const getWatchlist = async (): Promise<WatchlistItem[]> => {
-  return apiCall('/api/watchlist');
+  return apiCallAllPages('/api/watchlist');
 };
 
 export const addToWatchlist = async (item: WatchlistItemIn): Promise<WatchlistItem> => {
@@ -0,0 +1,92 @@
+# Mikrobenchmark CPU na żądanie: dawna ścieżka (response.json() + jsonable_encoder +
+# JSONResponse) kontra przekazywanie surowych bajtów z cache i ścieżka orjson.
+# Uruchomienie z katalogu tmdb-proxy: python bench/bench_json_path.py
+from pathlib import Path
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+import json, sys, timeit
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from cache import ResponseCache
+from responses import EncodedBody, EncodedResponse
+import orjson
+
+def discover_page():
+    return {
+        "page": 1,
+        "total_pages": 500,
+        "total_results": 10000,
+        "results": [
+            {
+                "id": 1000 + i,
+                "title": f"Tytuł filmu {i} – zażółć gęślą jaźń",
+                "original_title": f"Original title {i}",
+                "overview": "Opis fabuły " * 30,
+                "poster_path": f"/poster{i}.jpg",
+                "backdrop_path": f"/backdrop{i}.jpg",
+                "genre_ids": [28, 12, 878],
+                "release_date": "2024-05-01",
+                "vote_average": 7.3,
+                "vote_count": 1234,
+                "popularity": 345.67,
+                "adult": False,
+                "video": False,
+                "original_language": "en",
+            }
+            for i in range(20)
+        ],
+    }
+
+def watch_providers():
+    region = {
+        "link": "https://www.themoviedb.org/movie/1/watch",
+        "flatrate": [{"provider_id": i, "provider_name": f"Provider {i}", "logo_path": f"/l{i}.png", "display_priority": i} for i in range(6)],
+        "rent": [{"provider_id": i, "provider_name": f"Provider {i}", "logo_path": f"/l{i}.png", "display_priority": i} for i in range(4)],
+    }
+    return {"id": 1, "results": {code: region for code in ("PL", "US", "GB", "DE", "FR", "ES", "IT", "NL", "SE", "CZ")}}
+
+def legacy_passthrough(raw):
+    data = json.loads(raw)
+    return JSONResponse(content=jsonable_encoder(data)).body
+
+def legacy_region_slice(raw):
+    data = json.loads(raw)
+    sliced = data.get("results", {}).get("PL") or {}
+    return JSONResponse(content=jsonable_encoder(sliced)).body
+
+def orjson_region_slice(raw):
+    data = orjson.loads(raw)
+    return orjson.dumps(data.get("results", {}).get("PL") or {})
+
+def run(label, fn, number):
+    seconds = min(timeit.repeat(fn, number=number, repeat=5))
+    per_call = seconds / number * 1e6
+    print(f"{label:<48} {per_call:10.1f} µs/req")
+    return per_call
+
+def main():
+    cache = ResponseCache()
+    number = 2000
+
+    raw = json.dumps(discover_page(), ensure_ascii=False).encode("utf-8")
+    entry = cache.set("/discover/movie?page=1", EncodedBody(raw), "listing")
+    print(f"/discover/movie payload: {len(raw)} B")
+    legacy = run("legacy: parse + jsonable_encoder + dumps", lambda: legacy_passthrough(raw), number)
+    passthrough = run("passthrough: cached bytes", lambda: EncodedResponse(cache.get(entry.key, "listing").encoded).body, number)
+    print(f"{'saved per request':<48} {legacy - passthrough:10.1f} µs ({legacy / passthrough:.0f}x)\n")
+
+    raw = json.dumps(watch_providers()).encode("utf-8")
+    entry = cache.set("/movie/1/watch/providers", EncodedBody(raw), "details")
+    print(f"/movie/{{id}}/watch/providers payload: {len(raw)} B")
+    legacy = run("legacy: parse + slice + jsonable_encoder + dumps", lambda: legacy_region_slice(raw), number)
+    fast = run("orjson: parse + slice + dumps", lambda: orjson_region_slice(raw), number)
+    derived = run(
+        "derived: slice cached on entry",
+        lambda: cache.derive(entry, ("region", "PL"), lambda v: EncodedBody.from_data(v["results"]["PL"])).body,
+        number,
+    )
+    print(f"{'saved per request (orjson / derived)':<48} {legacy - fast:10.1f} µs / {legacy - derived:.1f} µs")
+
+if __name__ == "__main__":
+    main()
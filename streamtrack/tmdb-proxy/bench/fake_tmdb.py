@@ -0,0 +1,249 @@
+# Zastępczy serwer TMDB do testów wydajności proxy bez ruchu do prawdziwego API.
+# Serwuje endpointy używane przez tmdb.py z deterministycznych danych (ziarno --seed),
+# z konfigurowalnym rozkładem opóźnień, odsetkiem błędów 5xx i wstrzykiwaniem 429.
+#   python bench/fake_tmdb.py --port 9100 --latency-ms 80 --error-rate 0.01 --rate-limit-rate 0.005
+# Proxy wskazujemy na niego przez TMDB_API_URL=http://127.0.0.1:9100/3
+from collections import Counter
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+import argparse, asyncio, math, random, uvicorn
+
+PAGE_SIZE = 20
+REGIONS = ("PL", "US", "GB", "DE")
+WORDS = (
+    "dark", "night", "city", "lost", "star", "river", "king", "shadow", "last", "blue", "iron", "silent",
+    "ghost", "winter", "storm", "golden", "empire", "road", "secret", "wild", "broken", "crown", "fire",
+    "ocean", "mountain", "dream", "hunter", "garden", "machine", "echo", "władca", "żelazny", "cień", "miasto",
+)
+MOVIE_GENRES = {28: "Akcja", 12: "Przygodowy", 16: "Animacja", 35: "Komedia", 80: "Kryminał", 18: "Dramat", 878: "Sci-Fi"}
+TV_GENRES = {10759: "Action & Adventure", 16: "Animacja", 35: "Komedia", 80: "Kryminał", 18: "Dramat", 10765: "Sci-Fi & Fantasy"}
+PROVIDERS = {8: "Netflix", 119: "Amazon Prime Video", 337: "Disney Plus", 1899: "Max", 350: "Apple TV Plus"}
+
+config = argparse.Namespace(
+    seed=42, movies=2000, tv=800, latency_ms=60.0, latency_sigma=0.5,
+    error_rate=0.0, rate_limit_rate=0.0, retry_after=1.0,
+)
+catalog = {}
+counters = Counter()
+app = FastAPI()
+
+def build_catalog():
+    rng = random.Random(config.seed)
+    catalog.clear()
+    for media_type, count, genres in (("movie", config.movies, MOVIE_GENRES), ("tv", config.tv, TV_GENRES)):
+        items = {}
+        for i in range(count):
+            media_id = (1 if media_type == "movie" else 100000) + i
+            title = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 4))).title()
+            date = f"{rng.randint(1970, 2025)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+            item = {
+                "id": media_id,
+                "overview": " ".join(rng.choice(WORDS) for _ in range(rng.randint(20, 60))),
+                "poster_path": f"/p{media_id}.jpg",
+                "backdrop_path": f"/b{media_id}.jpg",
+                "genre_ids": rng.sample(sorted(genres), rng.randint(1, 3)),
+                # Rozkład potęgowy: kilka bardzo popularnych tytułów, długi ogon
+                "popularity": round(1000 / (i + 1) ** 0.8 + rng.random(), 3),
+                "vote_average": round(rng.uniform(3, 9), 1),
+                "vote_count": rng.randint(0, 20000),
+                "original_language": "en",
+                "providers": {region: rng.sample(sorted(PROVIDERS), rng.randint(0, 3)) for region in REGIONS},
+            }
+            if media_type == "movie":
+                item.update(title=title, original_title=title, release_date=date, adult=False, video=False)
+            else:
+                item.update(name=title, original_name=title, first_air_date=date)
+            items[media_id] = item
+        catalog[media_type] = items
+
+def list_item(item, media_type=None):
+    listed = {k: v for k, v in item.items() if k != "providers"}
+    if media_type is not None:
+        listed["media_type"] = media_type
+    return listed
+
+def paginate(items, page):
+    total_pages = max(1, math.ceil(len(items) / PAGE_SIZE))
+    start = (page - 1) * PAGE_SIZE
+    return {
+        "page": page,
+        "results": items[start:start + PAGE_SIZE],
+        "total_pages": min(total_pages, 500),
+        "total_results": len(items),
+    }
+
+def providers_document(item):
+    return {
+        "id": item["id"],
+        "results": {
+            region: {
+                "link": f"https://www.themoviedb.org/{item['id']}/watch?locale={region}",
+                "flatrate": [
+                    {"provider_id": pid, "provider_name": PROVIDERS[pid], "logo_path": f"/l{pid}.png", "display_priority": n}
+                    for n, pid in enumerate(ids)
+                ],
+            }
+            for region, ids in item["providers"].items() if ids
+        },
+    }
+
+def similar_items(media_type, item):
+    items = catalog[media_type]
+    ids = [i for i in items if i != item["id"] and set(items[i]["genre_ids"]) & set(item["genre_ids"])]
+    return [list_item(items[i]) for i in ids[:PAGE_SIZE * 3]]
+
+SECTIONS = {
+    "credits": lambda media_type, item: {
+        "id": item["id"],
+        "cast": [{"id": n, "name": f"Actor {n}", "character": f"Role {n}", "order": n} for n in range(15)],
+        "crew": [{"id": 100 + n, "name": f"Crew {n}", "job": "Director" if n == 0 else "Writer"} for n in range(5)],
+    },
+    "videos": lambda media_type, item: {
+        "id": item["id"],
+        "results": [{"key": f"v{item['id']}{n}", "site": "YouTube", "type": "Trailer", "name": f"Trailer {n}"} for n in range(2)],
+    },
+    "similar": lambda media_type, item: paginate(similar_items(media_type, item), 1),
+    "reviews": lambda media_type, item: {
+        "id": item["id"], "page": 1, "total_pages": 1, "total_results": 2,
+        "results": [{"id": f"r{item['id']}{n}", "author": f"critic{n}", "content": "Solid. " * 40} for n in range(2)],
+    },
+    "external_ids": lambda media_type, item: {"id": item["id"], "imdb_id": f"tt{item['id']:07d}"},
+    "watch/providers": lambda media_type, item: providers_document(item),
+}
+
+def details_document(media_type, item):
+    genres = MOVIE_GENRES if media_type == "movie" else TV_GENRES
+    document = list_item(item)
+    document.pop("genre_ids")
+    document["genres"] = [{"id": g, "name": genres[g]} for g in item["genre_ids"]]
+    document.update(tagline="A tagline.", status="Released", homepage="", runtime=110)
+    if media_type == "tv":
+        document.update(number_of_seasons=3, number_of_episodes=30, episode_run_time=[45])
+    return document
+
+def not_found():
+    return JSONResponse({"success": False, "status_code": 34, "status_message": "The resource you requested could not be found."}, 404)
+
+@app.middleware("http")
+async def simulate_upstream(request: Request, call_next):
+    if request.url.path.startswith("/__"):
+        return await call_next(request)
+    # Opóźnienie z rozkładu log-normalnego o zadanej medianie
+    await asyncio.sleep(random.lognormvariate(math.log(config.latency_ms / 1000), config.latency_sigma))
+    group = endpoint_group(request.url.path)
+    counters["requests"] += 1
+    counters[f"group:{group}"] += 1
+    roll = random.random()
+    if roll < config.rate_limit_rate:
+        counters["status:429"] += 1
+        return JSONResponse(
+            {"status_code": 25, "status_message": "Your request count is over the allowed limit."},
+            429, headers={"Retry-After": str(config.retry_after)},
+        )
+    if roll < config.rate_limit_rate + config.error_rate:
+        counters["status:503"] += 1
+        return JSONResponse({"status_message": "Service unavailable"}, 503)
+    response = await call_next(request)
+    counters[f"status:{response.status_code}"] += 1
+    return response
+
+def endpoint_group(path):
+    parts = path.removeprefix("/3/").split("/")
+    if parts[0] in ("movie", "tv") and len(parts) > 2:
+        return f"{parts[0]}/{'/'.join(parts[2:])}"
+    if parts[0] in ("movie", "tv"):
+        return parts[0]
+    return "/".join(parts)
+
+@app.get("/__stats")
+async def stats():
+    return dict(counters)
+
+@app.post("/__reset")
+async def reset():
+    counters.clear()
+    return {}
+
+@app.get("/3/search/multi")
+async def search_multi(query: str, page: int = 1):
+    needle = query.lower()
+    results = [
+        list_item(item, media_type)
+        for media_type in ("movie", "tv")
+        for item in catalog[media_type].values()
+        if needle in (item.get("title") or item.get("name")).lower()
+    ]
+    results.sort(key=lambda item: -item["popularity"])
+    return paginate(results, page)
+
+@app.get("/3/discover/{media_type}")
+async def discover(media_type: str, page: int = 1, with_genres: str = None, watch_region: str = "PL",
+                   with_watch_providers: str = None):
+    if media_type not in catalog:
+        return not_found()
+    items = catalog[media_type].values()
+    if with_genres:
+        wanted = {int(g) for g in with_genres.replace("|", ",").split(",") if g}
+        items = [item for item in items if wanted & set(item["genre_ids"])]
+    if with_watch_providers:
+        wanted = {int(p) for p in with_watch_providers.replace("|", ",").split(",") if p}
+        items = [item for item in items if wanted & set(item["providers"].get(watch_region, []))]
+    ranked = sorted(items, key=lambda item: -item["popularity"])
+    return paginate([list_item(item) for item in ranked], page)
+
+@app.get("/3/genre/{media_type}/list")
+async def genres(media_type: str):
+    genres = MOVIE_GENRES if media_type == "movie" else TV_GENRES
+    return {"genres": [{"id": g, "name": name} for g, name in genres.items()]}
+
+@app.get("/3/watch/providers/{media_type}")
+async def watch_providers(media_type: str):
+    return {"results": [
+        {"provider_id": pid, "provider_name": name, "logo_path": f"/l{pid}.png", "display_priority": n}
+        for n, (pid, name) in enumerate(PROVIDERS.items())
+    ]}
+
+@app.get("/3/{media_type}/{media_id}")
+async def details(media_type: str, media_id: int, append_to_response: str = ""):
+    item = catalog.get(media_type, {}).get(media_id)
+    if item is None:
+        return not_found()
+    document = details_document(media_type, item)
+    for section in filter(None, append_to_response.split(",")):
+        if section in SECTIONS:
+            document[section] = SECTIONS[section](media_type, item)
+    return document
+
+@app.get("/3/{media_type}/{media_id}/{section:path}")
+async def details_section(media_type: str, media_id: int, section: str, page: int = 1):
+    item = catalog.get(media_type, {}).get(media_id)
+    if item is None or section not in SECTIONS:
+        return not_found()
+    if section == "similar":
+        return paginate(similar_items(media_type, item), page)
+    return SECTIONS[section](media_type, item)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline TMDB stand-in for proxy benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--seed", type=int, default=config.seed)
+    parser.add_argument("--movies", type=int, default=config.movies)
+    parser.add_argument("--tv", type=int, default=config.tv)
+    parser.add_argument("--latency-ms", type=float, default=config.latency_ms, help="median upstream latency")
+    parser.add_argument("--latency-sigma", type=float, default=config.latency_sigma, help="log-normal spread (0 = constant)")
+    parser.add_argument("--error-rate", type=float, default=config.error_rate, help="fraction of 503 responses")
+    parser.add_argument("--rate-limit-rate", type=float, default=config.rate_limit_rate, help="fraction of 429 responses")
+    parser.add_argument("--retry-after", type=float, default=config.retry_after, help="Retry-After sent with 429")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    for name in vars(config):
+        setattr(config, name, getattr(args, name))
+    random.seed(config.seed)
+    build_catalog()
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
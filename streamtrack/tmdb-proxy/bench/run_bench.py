@@ -0,0 +1,254 @@
+# Benchmark proxy na zastępczym serwerze TMDB (bench/fake_tmdb.py).
+# Uruchamia oba serwery jako osobne procesy, odtwarza powtarzalny miks ruchu
+# (search, discover, szczegóły, serie zapytań strony tytułu) i porównuje wynik z baseline.
+#   python bench/run_bench.py                     # porównanie z bench/baseline.json
+#   python bench/run_bench.py --update-baseline   # zapis nowego baseline
+# Kod wyjścia 1 oznacza regresję względem baseline. Wyniki zależą od maszyny -
+# baseline należy odświeżyć po zmianie środowiska, na którym uruchamiany jest benchmark.
+from pathlib import Path
+import argparse, asyncio, json, os, random, socket, subprocess, sys, time
+import httpx
+
+BENCH_DIR = Path(__file__).resolve().parent
+PROXY_DIR = BENCH_DIR.parent
+DEFAULT_BASELINE = BENCH_DIR / "baseline.json"
+
+# Udziały operacji w miksie ruchu
+TRAFFIC_MIX = {"search": 0.25, "suggest": 0.15, "discover": 0.25, "details": 0.15, "title_page": 0.20}
+TITLE_PAGE_PARTS = ("", "/credits", "/videos", "/similar", "/reviews", "/watch/providers")
+SEARCH_TERMS = ("dark", "night", "city", "star", "king", "shadow", "blue", "storm", "empire", "ocean", "dream", "echo")
+
+# Metryki porównywane z baseline: (nazwa, czy wyższa wartość jest lepsza)
+CHECKS = (
+    ("throughput_rps", True),
+    ("latency_ms.p50", False),
+    ("latency_ms.p95", False),
+    ("latency_ms.p99", False),
+    ("upstream_calls", False),
+    ("hit_rate", True),
+)
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def popular_id(rng, first, count):
+    # Rozkład Zipfa - większość ruchu trafia w niewielki zbiór popularnych tytułów
+    return first + min(int(rng.paretovariate(1.2)) - 1, count - 1)
+
+def build_traffic(seed, operations, movies, tv):
+    rng = random.Random(seed)
+    names, weights = zip(*TRAFFIC_MIX.items())
+    traffic = []
+    for _ in range(operations):
+        kind = rng.choices(names, weights)[0]
+        media_type = rng.choice(("movie", "tv"))
+        media_id = popular_id(rng, 1, movies) if media_type == "movie" else popular_id(rng, 100000, tv)
+        if kind == "search":
+            term = rng.choice(SEARCH_TERMS)
+            traffic.append([f"/search?query={term}"])
+        elif kind == "suggest":
+            term = rng.choice(SEARCH_TERMS)
+            # Kolejne znaki wpisywane w pole wyszukiwania
+            traffic.append([f"/search/suggest?q={term[:n]}" for n in range(1, len(term) + 1)])
+        elif kind == "discover":
+            page = min(int(rng.paretovariate(1.5)), 10)
+            traffic.append([f"/discover/{media_type}?page={page}&fields=card"])
+        elif kind == "details":
+            traffic.append([f"/details/{media_type}/{media_id}?fields=detail"])
+        else:
+            # Strona tytułu: /title i równoległe zapytania o sekcje
+            burst = [f"/title/{media_type}/{media_id}"]
+            burst += [f"/{media_type}/{media_id}{part}" for part in TITLE_PAGE_PARTS]
+            traffic.append(burst)
+    return traffic
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+async def wait_ready(url, timeout=30):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(url)).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"{url} did not become ready within {timeout}s")
+
+async def drive(proxy_url, traffic, concurrency):
+    latencies = []
+    statuses = {}
+    cache_statuses = {}
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency * 2, max_keepalive_connections=concurrency * 2)
+
+    async with httpx.AsyncClient(base_url=proxy_url, timeout=30, limits=limits) as client:
+        async def request(path):
+            nonlocal errors
+            started = time.perf_counter()
+            try:
+                response = await client.get(path)
+            except httpx.HTTPError:
+                errors += 1
+                return
+            latencies.append((time.perf_counter() - started) * 1000)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            cache_status = response.headers.get("x-cache-status")
+            if cache_status:
+                cache_statuses[cache_status] = cache_statuses.get(cache_status, 0) + 1
+
+        async def operation(paths):
+            async with semaphore:
+                if paths[0].startswith("/search/suggest"):
+                    for path in paths:
+                        await request(path)
+                else:
+                    await asyncio.gather(*(request(path) for path in paths))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(operation(paths) for paths in traffic))
+        elapsed = time.perf_counter() - started
+        cache_stats = (await client.get("/cache/stats")).json()
+        upstream_stats = (await client.get("/upstream/stats")).json()
+    return latencies, statuses, cache_statuses, errors, elapsed, cache_stats, upstream_stats
+
+def report(args, latencies, statuses, cache_statuses, errors, elapsed, cache_stats, upstream_stats, fake_stats):
+    hits = cache_statuses.get("HIT", 0) + cache_statuses.get("STALE", 0)
+    looked_up = hits + cache_statuses.get("MISS", 0)
+    return {
+        "config": {
+            "operations": args.operations,
+            "concurrency": args.concurrency,
+            "seed": args.seed,
+            "latency_ms": args.latency_ms,
+            "latency_sigma": args.latency_sigma,
+            "error_rate": args.error_rate,
+            "rate_limit_rate": args.rate_limit_rate,
+        },
+        "requests": len(latencies),
+        "errors": errors + sum(count for status, count in statuses.items() if status >= 500),
+        "statuses": {str(k): v for k, v in sorted(statuses.items())},
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "latency_ms": {f"p{q}": round(percentile(latencies, q), 2) for q in (50, 95, 99)},
+        "upstream_calls": fake_stats.get("requests", 0),
+        "upstream_by_endpoint": {k.removeprefix("group:"): v for k, v in sorted(fake_stats.items()) if k.startswith("group:")},
+        "upstream_429": fake_stats.get("status:429", 0),
+        "hit_rate": round(hits / looked_up, 4) if looked_up else 0.0,
+        "cache_statuses": cache_statuses,
+        "coalesced": cache_stats.get("coalesced", 0),
+        "scheduler": {k: upstream_stats.get(k) for k in ("granted", "queued", "throttled", "max_queue_depth", "max_wait")},
+    }
+
+def metric(result, name):
+    value = result
+    for part in name.split("."):
+        value = value[part]
+    return value
+
+def compare(result, baseline, tolerance):
+    regressions = []
+    print(f"{'metric':<18} {'baseline':>12} {'current':>12} {'change':>9}")
+    for name, higher_is_better in CHECKS:
+        old, new = metric(baseline, name), metric(result, name)
+        change = (new - old) / old if old else 0.0
+        worse = -change if higher_is_better else change
+        flag = "  REGRESSION" if worse > tolerance else ""
+        print(f"{name:<18} {old:>12} {new:>12} {change:>+8.1%}{flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+def start_servers(args, fake_port, proxy_port):
+    fake = subprocess.Popen([
+        sys.executable, str(BENCH_DIR / "fake_tmdb.py"), "--port", str(fake_port), "--seed", str(args.seed),
+        "--movies", str(args.movies), "--tv", str(args.tv),
+        "--latency-ms", str(args.latency_ms), "--latency-sigma", str(args.latency_sigma),
+        "--error-rate", str(args.error_rate), "--rate-limit-rate", str(args.rate_limit_rate),
+    ])
+    env = {
+        **os.environ,
+        "TMDB_API_KEY": "bench",
+        "TMDB_API_URL": f"http://127.0.0.1:{fake_port}/3",
+        "DISK_CACHE_ENABLED": "false",
+        "WARMER_ENABLED": "false",
+    }
+    proxy = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(proxy_port), "--log-level", "warning"],
+        cwd=PROXY_DIR, env=env,
+    )
+    return fake, proxy
+
+async def run(args):
+    fake_port, proxy_port = free_port(), free_port()
+    fake_url, proxy_url = f"http://127.0.0.1:{fake_port}", f"http://127.0.0.1:{proxy_port}"
+    fake, proxy = start_servers(args, fake_port, proxy_port)
+    try:
+        await wait_ready(f"{fake_url}/__stats")
+        await wait_ready(f"{proxy_url}/ready")
+        traffic = build_traffic(args.seed, args.operations, args.movies, args.tv)
+        measured = await drive(proxy_url, traffic, args.concurrency)
+        async with httpx.AsyncClient() as client:
+            fake_stats = (await client.get(f"{fake_url}/__stats")).json()
+        return report(args, *measured, fake_stats)
+    finally:
+        for process in (proxy, fake):
+            process.terminate()
+            process.wait(timeout=10)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Load benchmark for tmdb-proxy against the fake TMDB server")
+    parser.add_argument("--operations", type=int, default=1500, help="user operations to replay")
+    parser.add_argument("--concurrency", type=int, default=32, help="operations in flight")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--movies", type=int, default=2000)
+    parser.add_argument("--tv", type=int, default=800)
+    parser.add_argument("--latency-ms", type=float, default=60.0)
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per benchmark; the median run is reported")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed relative regression per metric")
+    parser.add_argument("--report", type=Path, help="write the JSON report here")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    # Każdy przebieg na świeżych procesach; raportujemy przebieg o medianowej przepustowości
+    runs = sorted((asyncio.run(run(args)) for _ in range(args.repeat)), key=lambda r: r["throughput_rps"])
+    result = runs[len(runs) // 2]
+    result["runs_throughput_rps"] = [r["throughput_rps"] for r in runs]
+    print(json.dumps(result, indent=2))
+    if args.report:
+        args.report.write_text(json.dumps(result, indent=2) + "\n")
+    if args.update_baseline:
+        args.baseline.write_text(json.dumps(result, indent=2) + "\n")
+        print(f"Baseline written to {args.baseline}")
+        return 0
+    if not args.baseline.exists():
+        print(f"No baseline at {args.baseline}; run with --update-baseline first")
+        return 1
+    baseline = json.loads(args.baseline.read_text())
+    if baseline["config"] != result["config"]:
+        print("Benchmark config differs from the baseline; results are not comparable")
+        return 1
+    regressions = compare(result, baseline, args.tolerance)
+    if regressions:
+        print(f"Regression in: {', '.join(regressions)}")
+        return 1
+    print("No regressions")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
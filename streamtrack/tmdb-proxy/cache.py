@@ -0,0 +1,165 @@
+from collections import OrderedDict
+from urllib.parse import urlencode
+import orjson, os, time
+
+# Klasy TTL (w sekundach): gatunki i katalogi dostawców zmieniają się rzadko,
+# szczegóły tytułów co kilka godzin, a wyniki discover/search szybko się starzeją.
+TTL_CLASSES = {
+    "static": int(os.getenv("CACHE_TTL_STATIC", str(3 * 24 * 3600))),
+    "details": int(os.getenv("CACHE_TTL_DETAILS", str(6 * 3600))),
+    "listing": int(os.getenv("CACHE_TTL_LISTING", str(10 * 60))),
+}
+# Jak długo po wygaśnięciu TTL wpis może być jeszcze serwowany jako nieaktualny
+# (w tle odświeżany, a przy awarii TMDB zwracany zamiast błędu).
+STALE_TTL_CLASSES = {
+    "static": int(os.getenv("CACHE_STALE_TTL_STATIC", str(30 * 24 * 3600))),
+    "details": int(os.getenv("CACHE_STALE_TTL_DETAILS", str(3 * 24 * 3600))),
+    "listing": int(os.getenv("CACHE_STALE_TTL_LISTING", str(24 * 3600))),
+}
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "5000"))
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+def make_cache_key(path, params):
+    normalized = sorted(
+        (k, str(v)) for k, v in params.items()
+        if v is not None and k != "api_key"
+    )
+    return f"{path}?{urlencode(normalized)}" if normalized else path
+
+class CacheEntry:
+    __slots__ = ("key", "_value", "encoded", "derived", "size", "ttl_class",
+                 "fresh_until", "stale_until", "revalidation_failed")
+
+    def __init__(self, key, encoded, ttl_class, fresh_until, stale_until):
+        self.key = key
+        self._value = None
+        self.encoded = encoded
+        self.derived = {}
+        self.size = encoded.nbytes
+        self.ttl_class = ttl_class
+        self.fresh_until = fresh_until
+        self.stale_until = stale_until
+        self.revalidation_failed = False
+
+    @property
+    def value(self):
+        # Parsowanie dopiero gdy handler faktycznie przekształca dokument;
+        # odpowiedzi przekazywane bez zmian idą prosto z encoded.body.
+        if self._value is None:
+            self._value = orjson.loads(self.encoded.body)
+        return self._value
+
+    def is_fresh(self):
+        return time.monotonic() < self.fresh_until
+
+    def max_age(self):
+        return max(0, int(self.fresh_until - time.monotonic()))
+
+class ResponseCache:
+    def __init__(self, max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES,
+                 ttl_classes=TTL_CLASSES, stale_ttl_classes=STALE_TTL_CLASSES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_classes = ttl_classes
+        self.stale_ttl_classes = stale_ttl_classes
+        self.size_bytes = 0
+        self._entries = OrderedDict()
+        self.hits = {name: 0 for name in ttl_classes}
+        self.stale_hits = {name: 0 for name in ttl_classes}
+        self.misses = {name: 0 for name in ttl_classes}
+        self.evictions = {name: 0 for name in ttl_classes}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key, ttl_class):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses[ttl_class] += 1
+            return None
+        now = time.monotonic()
+        if entry.stale_until <= now:
+            self._remove(key)
+            self.misses[ttl_class] += 1
+            return None
+        self._entries.move_to_end(key)
+        if entry.fresh_until <= now:
+            self.stale_hits[ttl_class] += 1
+        else:
+            self.hits[ttl_class] += 1
+        return entry
+
+    def set(self, key, encoded, ttl_class, fresh_for=None, stale_for=None):
+        # fresh_for/stale_for: ile sekund od teraz wpis jest świeży / może być serwowany
+        if fresh_for is None:
+            fresh_for = self.ttl_classes[ttl_class]
+        if stale_for is None:
+            stale_for = fresh_for + self.stale_ttl_classes[ttl_class]
+        now = time.monotonic()
+        entry = CacheEntry(key, encoded, ttl_class, now + fresh_for, now + stale_for)
+        if entry.size > self.max_bytes:
+            return entry
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = entry
+        self.size_bytes += entry.size
+        self._evict()
+        return entry
+
+    def derive(self, entry, key, build):
+        # Odpowiedź pochodna (np. wycinek regionu) liczona raz i trzymana przy wpisie
+        encoded = entry.derived.get(key)
+        if encoded is None:
+            encoded = build(entry.value)
+            entry.derived[key] = encoded
+            entry.size += encoded.nbytes
+            if self._entries.get(entry.key) is entry:
+                self.size_bytes += encoded.nbytes
+                self._evict()
+        return encoded
+
+    def _evict(self):
+        while len(self._entries) > self.max_entries or self.size_bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size_bytes -= evicted.size
+            self.evictions[evicted.ttl_class] += 1
+
+    def expires_within(self, key, seconds):
+        entry = self._entries.get(key)
+        return entry is None or entry.fresh_until - time.monotonic() < seconds
+
+    def delete(self, key):
+        if key in self._entries:
+            self._remove(key)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self.size_bytes -= entry.size
+
+    def clear(self):
+        self._entries.clear()
+        self.size_bytes = 0
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "size_bytes": self.size_bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl_classes": {
+                name: {
+                    "ttl": ttl,
+                    "stale_ttl": self.stale_ttl_classes[name],
+                    "hits": self.hits[name],
+                    "stale_hits": self.stale_hits[name],
+                    "misses": self.misses[name],
+                    "evictions": self.evictions[name],
+                }
+                for name, ttl in self.ttl_classes.items()
+            },
+        }
+
+response_cache = ResponseCache()
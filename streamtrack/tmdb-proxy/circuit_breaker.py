@@ -0,0 +1,117 @@
+from collections import deque
+import httpx, os, time
+
+# Obwód otwiera się, gdy w oknie BREAKER_WINDOW sekund co najmniej BREAKER_FAILURE_RATE
+# wywołań zakończyło się błędem, o ile było ich przynajmniej BREAKER_MIN_REQUESTS
+BREAKER_FAILURE_RATE = float(os.getenv("BREAKER_FAILURE_RATE", "0.5"))
+BREAKER_MIN_REQUESTS = int(os.getenv("BREAKER_MIN_REQUESTS", "20"))
+BREAKER_WINDOW = int(os.getenv("BREAKER_WINDOW", "30"))
+BREAKER_RESET_TIMEOUT = float(os.getenv("BREAKER_RESET_TIMEOUT", "30"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitOpenError(httpx.HTTPError):
+    def __init__(self, breaker):
+        super().__init__(f"Circuit for {breaker.name} is open")
+        self.retry_after = breaker.retry_after()
+
+class CircuitBreaker:
+    # Gdy odsetek nieudanych wywołań TMDB (5xx, timeouty, brak połączenia - po wszystkich
+    # ponowieniach) w przesuwnym oknie przekroczy próg, przestajemy wysyłać zapytania z danej
+    # grupy endpointów na reset_timeout sekund; potem jedno zapytanie próbne decyduje,
+    # czy obwód się zamyka. Okno to kubełki jednosekundowe, więc pamięć jest stała.
+    def __init__(self, name, failure_rate=BREAKER_FAILURE_RATE, min_requests=BREAKER_MIN_REQUESTS,
+                 window=BREAKER_WINDOW, reset_timeout=BREAKER_RESET_TIMEOUT):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_requests = min_requests
+        self.window = window
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        # [sekunda, wywołania, błędy]
+        self._buckets = deque()
+        self.opened_at = 0.0
+        self.probe_started_at = None
+        self.opened = 0
+        self.rejected = 0
+
+    def retry_after(self):
+        return max(0.0, self.opened_at + self.reset_timeout - time.monotonic())
+
+    def before_call(self):
+        if self.state == CLOSED:
+            return
+        now = time.monotonic()
+        if self.state == OPEN and now - self.opened_at >= self.reset_timeout:
+            self.state = HALF_OPEN
+            self.probe_started_at = None
+        if self.state == HALF_OPEN:
+            # Jedno zapytanie próbne naraz; zawieszona próba nie blokuje obwodu na zawsze
+            if self.probe_started_at is None or now - self.probe_started_at >= self.reset_timeout:
+                self.probe_started_at = now
+                return
+        self.rejected += 1
+        raise CircuitOpenError(self)
+
+    def _record(self, failed):
+        second = int(time.monotonic())
+        while self._buckets and self._buckets[0][0] <= second - self.window:
+            self._buckets.popleft()
+        if not self._buckets or self._buckets[-1][0] != second:
+            self._buckets.append([second, 0, 0])
+        bucket = self._buckets[-1]
+        bucket[1] += 1
+        bucket[2] += failed
+
+    def window_counts(self):
+        horizon = int(time.monotonic()) - self.window
+        calls = sum(bucket[1] for bucket in self._buckets if bucket[0] > horizon)
+        failures = sum(bucket[2] for bucket in self._buckets if bucket[0] > horizon)
+        return calls, failures
+
+    def _open(self):
+        if self.state != OPEN:
+            self.opened += 1
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.probe_started_at = None
+
+    def record_success(self):
+        # Wynik jednego wywołania logicznego (po ponowieniach), nie pojedynczej próby.
+        # Obwód zamyka tylko próba z HALF_OPEN - sukces wywołania rozpoczętego przed
+        # otwarciem trafia jedynie do okna.
+        if self.state == HALF_OPEN:
+            self._buckets.clear()
+            self.state = CLOSED
+            self.probe_started_at = None
+        self._record(False)
+
+    def record_failure(self):
+        if self.state == HALF_OPEN:
+            self._open()
+            return
+        self._record(True)
+        calls, failures = self.window_counts()
+        if self.state == CLOSED and calls >= self.min_requests and failures / calls >= self.failure_rate:
+            self._open()
+
+    def stats(self):
+        calls, failures = self.window_counts()
+        return {
+            "state": self.state,
+            "calls": calls,
+            "failures": failures,
+            "failure_rate": round(failures / calls, 3) if calls else 0.0,
+            "opened": self.opened,
+            "rejected": self.rejected,
+            "retry_after": round(self.retry_after(), 1) if self.state != CLOSED else 0.0,
+        }
+
+breakers = {}
+
+def breaker_for(group):
+    if group not in breakers:
+        breakers[group] = CircuitBreaker(group)
+    return breakers[group]
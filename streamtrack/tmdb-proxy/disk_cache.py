@@ -0,0 +1,145 @@
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import asyncio, os, sqlite3, time, zlib
+
+DISK_CACHE_ENABLED = os.getenv("DISK_CACHE_ENABLED", "true").lower() == "true"
+DISK_CACHE_PATH = os.getenv("DISK_CACHE_PATH", "cache/tmdb-cache.sqlite3")
+DISK_CACHE_MAX_BYTES = int(os.getenv("DISK_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+DISK_CACHE_COMPACT_INTERVAL = int(os.getenv("DISK_CACHE_COMPACT_INTERVAL", "600"))
+
+class DiskCache:
+    # Drugi poziom cache (SQLite w trybie WAL). Wszystkie operacje na bazie idą przez
+    # jeden wątek roboczy, więc pętla zdarzeń nigdy nie czeka na dysk.
+    def __init__(self, path=DISK_CACHE_PATH, max_bytes=DISK_CACHE_MAX_BYTES, enabled=DISK_CACHE_ENABLED):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="disk-cache")
+        self._conn = None
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.errors = 0
+        self.compacted = 0
+
+    def _connect(self):
+        if self._conn is None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, ttl_class TEXT NOT NULL, body BLOB NOT NULL, "
+                "size INTEGER NOT NULL, fresh_until REAL NOT NULL, stale_until REAL NOT NULL, "
+                "accessed_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _get(self, key):
+        conn = self._connect()
+        now = time.time()
+        row = conn.execute(
+            "SELECT body, fresh_until, stale_until FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or row[2] <= now:
+            return None
+        conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+        conn.commit()
+        body, fresh_until, stale_until = row
+        return zlib.decompress(body), fresh_until - now, stale_until - now
+
+    def _set(self, key, ttl_class, raw, fresh_for, stale_for):
+        try:
+            conn = self._connect()
+            now = time.time()
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, ttl_class, body, size, fresh_until, stale_until, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, ttl_class, zlib.compress(raw, 6), len(raw), now + fresh_for, now + stale_for, now),
+            )
+            conn.commit()
+            self.writes += 1
+        except (sqlite3.Error, OSError) as e:
+            self.errors += 1
+            print(f"Disk cache write failed: {e}")
+
+    def _compact(self):
+        conn = self._connect()
+        removed = conn.execute("DELETE FROM entries WHERE stale_until <= ?", (time.time(),)).rowcount
+        total = conn.execute("SELECT COALESCE(SUM(LENGTH(body)), 0) FROM entries").fetchone()[0]
+        if total > self.max_bytes:
+            # Usuwamy najdawniej używane wpisy aż do zejścia poniżej limitu
+            excess = total - self.max_bytes
+            for key, length in conn.execute("SELECT key, LENGTH(body) FROM entries ORDER BY accessed_at").fetchall():
+                if excess <= 0:
+                    break
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                excess -= length
+                removed += 1
+        conn.commit()
+        if removed:
+            conn.execute("PRAGMA incremental_vacuum")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        self.compacted += removed
+        return removed
+
+    async def get(self, key):
+        if not self.enabled:
+            return None
+        try:
+            stored = await asyncio.get_running_loop().run_in_executor(self._executor, self._get, key)
+        except (sqlite3.Error, OSError, zlib.error) as e:
+            self.errors += 1
+            print(f"Disk cache read failed: {e}")
+            return None
+        if stored is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return stored
+
+    def store(self, key, ttl_class, raw, fresh_for, stale_for):
+        # Zapis w tle - odpowiedź nie czeka na dysk
+        if self.enabled:
+            self._executor.submit(self._set, key, ttl_class, raw, fresh_for, stale_for)
+
+    async def compact(self):
+        if not self.enabled:
+            return 0
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self._compact)
+
+    async def run_compaction(self):
+        while True:
+            await asyncio.sleep(DISK_CACHE_COMPACT_INTERVAL)
+            try:
+                await self.compact()
+            except (sqlite3.Error, OSError) as e:
+                self.errors += 1
+                print(f"Disk cache compaction failed: {e}")
+
+    def _close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    async def close(self):
+        await asyncio.get_running_loop().run_in_executor(self._executor, self._close)
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "path": self.path,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "errors": self.errors,
+            "compacted": self.compacted,
+        }
+
+disk_cache = DiskCache()
@@ -0,0 +1,168 @@
+from http_client import TMDB_CONNECT_TIMEOUT, TMDB_POOL_TIMEOUT, TMDB_READ_TIMEOUT
+from circuit_breaker import breaker_for
+import asyncio, httpx, inspect, os, re
+
+TMDB_RETRIES = int(os.getenv("TMDB_RETRIES", os.getenv("TMDB_429_RETRIES", "2")))
+TMDB_ENDPOINT_CONCURRENCY = int(os.getenv("TMDB_ENDPOINT_CONCURRENCY", "32"))
+
+DEFAULT_ERROR_DETAIL = "Error fetching data from TMDB"
+MEDIA_TYPES = ("movie", "tv")
+REQUIRED = ...
+
+TITLE_APPENDS = ("credits", "videos", "similar", "reviews", "external_ids", "watch/providers")
+# Część dokumentu /title odpowiadająca zwykłym szczegółom (bez dołączonych sekcji)
+TITLE_DETAILS = "details"
+
+# Parametry zapytania normalizowane przed zbudowaniem klucza cache
+NORMALIZERS = {"watch_region": str.upper}
+
+PATH_PARAM_PATTERN = re.compile(r"{(\w+)}")
+
+def title_details(title):
+    return {k: v for k, v in title.items() if k not in TITLE_APPENDS}
+
+def region_slice(providers, watch_region):
+    region_providers = providers.get("results", {}).get(watch_region)
+    return region_providers if region_providers else {}
+
+def build_title(title, watch_region):
+    response = title_details(title)
+    for part in TITLE_APPENDS:
+        if part != "watch/providers":
+            response[part] = title.get(part)
+    response["watch_providers"] = region_slice(title.get("watch/providers", {}), watch_region)
+    return response
+
+class Endpoint:
+    # Jeden wiersz tabeli tras: ścieżka w proxy, ścieżka w TMDB, dozwolone parametry
+    # i polityki (klasa TTL, timeouty, ponowienia, limit współbieżności, fallback,
+    # grupa z jednym wspólnym circuit breakerem).
+    #   params - parametry klienta przekazywane do TMDB (nazwa -> wartość domyślna)
+    #   fixed  - parametry zawsze wysyłane do TMDB, niedostępne dla klienta
+    #   local  - parametry klienta używane tylko przez reshape (np. wycinek regionu)
+    def __init__(self, name, route, upstream, ttl_class, group, params=None, fixed=None, local=None,
+                 connect_timeout=TMDB_CONNECT_TIMEOUT, read_timeout=TMDB_READ_TIMEOUT,
+                 retries=TMDB_RETRIES, concurrency=TMDB_ENDPOINT_CONCURRENCY,
+                 fallback=None, error_detail=DEFAULT_ERROR_DETAIL, fields=False, title_part=None,
+                 reshape=None, media_type=None, suggest=False, paged=False):
+        self.name = name
+        self.route = route
+        self.upstream = upstream
+        self.ttl_class = ttl_class
+        self.group = group
+        self.breaker = breaker_for(group)
+        self.params = params or {}
+        self.fixed = fixed or {}
+        self.local = local or {}
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout, pool=TMDB_POOL_TIMEOUT)
+        # Ponowienia po 5xx, 429 i błędach sieci (z backoffem), nie po 4xx
+        self.retries = retries
+        self.concurrency = concurrency
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.fallback = fallback
+        # None = komunikat błędu przekazywany z TMDB (status_message)
+        self.error_detail = error_detail
+        self.fields = fields
+        self.title_part = title_part
+        self.reshape = reshape
+        self.media_type = media_type
+        # Czy tytuły z odpowiedzi trafiają do lokalnego indeksu podpowiedzi
+        self.suggest = suggest
+        # Listy stronicowane: zakres pages= strumieniowany jako NDJSON i prefetch następnej strony
+        self.paged = paged
+        self.path_params = tuple(PATH_PARAM_PATTERN.findall(route))
+
+    def upstream_path(self, path_args):
+        return self.upstream.format(**path_args)
+
+    def normalize(self, query):
+        return {k: NORMALIZERS[k](v) if k in NORMALIZERS and v is not None else v for k, v in query.items()}
+
+    def upstream_params(self, query=None):
+        query = query or {}
+        params = {k: query.get(k, default) for k, default in self.params.items()}
+        params.update(self.fixed)
+        return {k: v for k, v in self.normalize(params).items() if v is not None}
+
+    def signature(self):
+        # Sygnatura generowanego handlera - z niej FastAPI bierze parametry ścieżki i zapytania
+        parameters = [
+            inspect.Parameter(name, inspect.Parameter.KEYWORD_ONLY, annotation=str)
+            for name in self.path_params
+        ]
+        query = {**self.params, **self.local}
+        if self.fields:
+            query["fields"] = None
+        if self.paged:
+            query["pages"] = None
+        for name, default in query.items():
+            annotation = int if isinstance(default, int) else str
+            default = inspect.Parameter.empty if default is REQUIRED else default
+            parameters.append(inspect.Parameter(name, inspect.Parameter.KEYWORD_ONLY, default=default, annotation=annotation))
+        return inspect.Signature(parameters)
+
+def media_endpoints(name, suffix, ttl_class, group, **policy):
+    # Ta sama trasa dla filmów i seriali: /movie/{media_id}<suffix> i /tv/{media_id}<suffix>
+    return [
+        Endpoint(
+            f"{media_type}_{name}", f"/{media_type}/{{media_id}}{suffix}", f"/{media_type}/{{media_id}}{suffix}",
+            ttl_class, group, media_type=media_type, **policy,
+        )
+        for media_type in MEDIA_TYPES
+    ]
+
+def catalog_endpoints(name, route, upstream, ttl_class, group, **policy):
+    # Katalogi osobne dla filmów i seriali: <route>/movie -> <upstream>/movie/...
+    return [
+        Endpoint(f"{name}_{media_type}", f"{route}/{media_type}", upstream.format(media_type=media_type),
+                 ttl_class, group, media_type=media_type, **policy)
+        for media_type in MEDIA_TYPES
+    ]
+
+LANGUAGE = {"language": "pl-PL"}
+DISCOVER_PARAMS = {
+    **LANGUAGE,
+    "with_genres": None,
+    "with_watch_providers": None,
+    "watch_region": "PL",
+    "page": 1,
+    "sort_by": "popularity.desc",
+}
+
+ENDPOINTS = {endpoint.name: endpoint for endpoint in [
+    Endpoint("search", "/search", "/search/multi", "listing", "search",
+             params={"query": REQUIRED, **LANGUAGE}, connect_timeout=2, read_timeout=5, retries=1,
+             concurrency=16, fields=True, suggest=True),
+    *media_endpoints("details", "", "details", "details", params=LANGUAGE, fields=True, title_part=TITLE_DETAILS,
+                     error_detail="Error fetching details from TMDB", suggest=True),
+    *catalog_endpoints("genres", "/genres", "/genre/{media_type}/list", "static", "catalog", params=LANGUAGE,
+                       concurrency=4, error_detail="Error fetching genres from TMDB"),
+    *catalog_endpoints("providers", "/providers", "/watch/providers/{media_type}", "static", "catalog",
+                       params={**LANGUAGE, "watch_region": "PL"}, concurrency=4,
+                       error_detail="Error fetching providers from TMDB"),
+    *catalog_endpoints("discover", "/discover", "/discover/{media_type}", "listing", "discover",
+                       params=DISCOVER_PARAMS, fixed={"include_adult": "false"}, connect_timeout=2, read_timeout=8,
+                       concurrency=16, fields=True, error_detail="Error discovering titles from TMDB",
+                       suggest=True, paged=True),
+    *media_endpoints("watch_providers", "/watch/providers", "details", "details", local={"watch_region": "PL"},
+                     title_part="watch/providers", reshape=region_slice, fallback={"results": {}}),
+    Endpoint("details", "/details/{media_type}/{media_id}", "/{media_type}/{media_id}", "details", "details",
+             params=LANGUAGE, fields=True, title_part=TITLE_DETAILS, error_detail=None, suggest=True),
+    Endpoint("title", "/title/{media_type}/{media_id}", "/{media_type}/{media_id}", "details", "details",
+             params=LANGUAGE, fixed={"append_to_response": ",".join(TITLE_APPENDS)},
+             local={"watch_region": "PL"}, reshape=build_title, error_detail=None, suggest=True),
+    *media_endpoints("reviews", "/reviews", "details", "details", params={"language": "en-US", "page": 1},
+                     title_part="reviews", fallback={"results": [], "total_results": 0}),
+    *media_endpoints("credits", "/credits", "details", "details", params=LANGUAGE,
+                     title_part="credits", fallback={"cast": [], "crew": []}),
+    *media_endpoints("similar", "/similar", "details", "details", params={**LANGUAGE, "page": 1}, fields=True,
+                     title_part="similar", fallback={"results": []}, suggest=True),
+    *media_endpoints("videos", "/videos", "details", "details", params=LANGUAGE,
+                     title_part="videos", fallback={"results": []}),
+    *media_endpoints("external_ids", "/external_ids", "details", "details",
+                     title_part="external_ids", fallback={}),
+]}
+
+TITLE = ENDPOINTS["title"]
+DETAILS = ENDPOINTS["details"]
+SEARCH = ENDPOINTS["search"]
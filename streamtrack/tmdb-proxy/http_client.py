@@ -0,0 +1,53 @@
+import httpx, os
+
+TMDB_HTTP2 = os.getenv("TMDB_HTTP2", "true").lower() == "true"
+TMDB_MAX_CONNECTIONS = int(os.getenv("TMDB_MAX_CONNECTIONS", "100"))
+TMDB_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("TMDB_MAX_KEEPALIVE_CONNECTIONS", "20"))
+TMDB_KEEPALIVE_EXPIRY = float(os.getenv("TMDB_KEEPALIVE_EXPIRY", "30"))
+TMDB_CONNECT_TIMEOUT = float(os.getenv("TMDB_CONNECT_TIMEOUT", "3"))
+TMDB_READ_TIMEOUT = float(os.getenv("TMDB_READ_TIMEOUT", "10"))
+TMDB_POOL_TIMEOUT = float(os.getenv("TMDB_POOL_TIMEOUT", "5"))
+
+_client = None
+
+def create_client():
+    return httpx.AsyncClient(
+        http2=TMDB_HTTP2,
+        limits=httpx.Limits(
+            max_connections=TMDB_MAX_CONNECTIONS,
+            max_keepalive_connections=TMDB_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=TMDB_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(
+            TMDB_READ_TIMEOUT,
+            connect=TMDB_CONNECT_TIMEOUT,
+            pool=TMDB_POOL_TIMEOUT,
+        ),
+    )
+
+def get_client():
+    global _client
+    if _client is None or _client.is_closed:
+        _client = create_client()
+    return _client
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+def pool_stats():
+    # Stan puli połączeń do TMDB. httpx nie udostępnia go publicznie, więc
+    # czytamy pulę httpcore i przy zmianie jej wnętrza zwracamy same zera.
+    pool = getattr(getattr(_client, "_transport", None), "_pool", None)
+    connections = list(getattr(pool, "connections", []))
+    idle = sum(1 for connection in connections if connection.is_idle())
+    requests = getattr(pool, "_requests", [])
+    return {
+        "max_connections": TMDB_MAX_CONNECTIONS,
+        "connections": len(connections),
+        "active": len(connections) - idle,
+        "idle": idle,
+        "waiting": sum(1 for request in requests if getattr(request, "connection", None) is None),
+    }
@@ -1,8 +1,61 @@
-from fastapi import FastAPI
-from tmdb import router as tmdb_router
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+from contextlib import asynccontextmanager
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+import asyncio, time
+from tmdb import router as tmdb_router, request_cache_status, inflight
+from metrics import REQUEST_DURATION, REQUESTS_IN_FLIGHT, register_collector, route_label
+from http_client import get_client, close_client
+from warmer import WARMER_ENABLED, run_warmer, warmer_state
+from disk_cache import disk_cache
 from fastapi.middleware.cors import CORSMiddleware
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+  get_client()
+  warmer_task = asyncio.create_task(run_warmer()) if WARMER_ENABLED else None
+  compaction_task = asyncio.create_task(disk_cache.run_compaction()) if disk_cache.enabled else None
+  yield
+  for task in (warmer_task, compaction_task):
+    if task:
+      task.cancel()
+  await close_client()
+  await disk_cache.close()
+
+app = FastAPI(lifespan=lifespan)
+register_collector(inflight)
+
+@app.middleware("http")
+async def record_metrics(request: Request, call_next):
+  REQUESTS_IN_FLIGHT.inc()
+  started = time.perf_counter()
+  status = "500"
+  try:
+    response = await call_next(request)
+    status = str(response.status_code)
+    return response
+  finally:
+    REQUESTS_IN_FLIGHT.dec()
+    REQUEST_DURATION.labels(request.method, route_label(request.scope), status).observe(time.perf_counter() - started)
+
+@app.middleware("http")
+async def add_cache_status_header(request: Request, call_next):
+  holder = {}
+  token = request_cache_status.set(holder)
+  try:
+    response = await call_next(request)
+  finally:
+    request_cache_status.reset(token)
+
+  statuses = holder.get("statuses")
+  if statuses:
+    for status in ("STALE", "MISS", "HIT"):
+      if status in statuses:
+        response.headers["X-Cache-Status"] = status
+        break
+  if holder.get("revalidation_failed"):
+    response.headers["Warning"] = '111 - "Revalidation Failed"'
+  return response
 
 app.add_middleware(
   CORSMiddleware,
@@ -10,6 +63,16 @@ app.add_middleware(
   allow_credentials=True,
   allow_methods=["*"],
   allow_headers=["*"],
+  expose_headers=["X-Cache-Status", "Warning"],
 )
 
-app.include_router(tmdb_router)
\ No newline at end of file
+app.include_router(tmdb_router)
+
+@app.get("/ready")
+async def ready():
+  status_code = 200 if warmer_state["ready"] else 503
+  return JSONResponse(status_code=status_code, content=warmer_state)
+
+@app.get("/metrics")
+async def metrics():
+  return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
\ No newline at end of file
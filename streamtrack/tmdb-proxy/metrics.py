@@ -0,0 +1,105 @@
+from prometheus_client import Counter, Gauge, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, REGISTRY
+from cache import response_cache
+from circuit_breaker import breakers, CLOSED, HALF_OPEN, OPEN
+from disk_cache import disk_cache
+from endpoints import ENDPOINTS
+from http_client import pool_stats
+from rate_limiter import scheduler
+import httpx
+
+# Etykiety mają ograniczoną liczbę wartości: szablony tras, nazwy z tabeli endpointów,
+# klasy TTL i kody statusu - nigdy surowe ścieżki czy parametry zapytań.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+REQUEST_DURATION = Histogram(
+    "tmdb_proxy_request_duration_seconds", "Time to response headers per proxy route",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS,
+)
+REQUESTS_IN_FLIGHT = Gauge("tmdb_proxy_requests_in_flight", "Proxy requests currently being handled")
+UPSTREAM_DURATION = Histogram(
+    "tmdb_proxy_upstream_duration_seconds", "TMDB call latency per endpoint and outcome",
+    ["endpoint", "status"], buckets=LATENCY_BUCKETS,
+)
+PREFETCHES = Counter("tmdb_proxy_prefetches_total", "Speculative next-page prefetches started", ["endpoint"])
+
+def route_label(scope):
+    route = scope.get("route")
+    return getattr(route, "path", "unmatched")
+
+def upstream_status_label(response=None, error=None):
+    if error is not None:
+        return "timeout" if isinstance(error, httpx.TimeoutException) else "error"
+    return str(response.status_code)
+
+class ProxyCollector:
+    # Liczniki, które i tak prowadzą cache, scheduler i SingleFlight - czytane w chwili
+    # scrapowania, żeby nie liczyć tego samego dwa razy.
+    def __init__(self, inflight):
+        self.inflight = inflight
+
+    def collect(self):
+        stats = response_cache.stats()
+        for name, help_text in (
+            ("hits", "Fresh in-memory cache hits"),
+            ("stale_hits", "Stale in-memory cache hits served while revalidating"),
+            ("misses", "In-memory cache misses"),
+            ("evictions", "In-memory cache evictions"),
+        ):
+            family = CounterMetricFamily(f"tmdb_proxy_cache_{name}", help_text, labels=["ttl_class"])
+            for ttl_class, counters in stats["ttl_classes"].items():
+                family.add_metric([ttl_class], counters[name])
+            yield family
+        yield GaugeMetricFamily("tmdb_proxy_cache_entries", "Entries in the in-memory cache", value=stats["entries"])
+        yield GaugeMetricFamily("tmdb_proxy_cache_bytes", "Bytes held by the in-memory cache", value=stats["size_bytes"])
+
+        disk = disk_cache.stats()
+        family = CounterMetricFamily("tmdb_proxy_disk_cache_lookups", "Disk cache lookups", labels=["result"])
+        family.add_metric(["hit"], disk["hits"])
+        family.add_metric(["miss"], disk["misses"])
+        yield family
+
+        yield CounterMetricFamily("tmdb_proxy_coalesced_requests", "Requests joined to an in-flight TMDB call",
+                                  value=self.inflight.coalesced)
+        yield GaugeMetricFamily("tmdb_proxy_upstream_in_flight", "Distinct TMDB calls in flight", value=len(self.inflight))
+
+        pool = pool_stats()
+        family = GaugeMetricFamily("tmdb_proxy_pool_connections", "TMDB connection pool connections", labels=["state"])
+        for state in ("active", "idle"):
+            family.add_metric([state], pool[state])
+        yield family
+        yield GaugeMetricFamily("tmdb_proxy_pool_max_connections", "TMDB connection pool size limit",
+                                value=pool["max_connections"])
+        yield GaugeMetricFamily("tmdb_proxy_pool_waiting_requests", "Requests waiting for a pooled connection",
+                                value=pool["waiting"])
+
+        family = GaugeMetricFamily("tmdb_proxy_endpoint_concurrency_in_use",
+                                   "Upstream calls holding an endpoint concurrency slot", labels=["endpoint"])
+        limits = GaugeMetricFamily("tmdb_proxy_endpoint_concurrency_limit",
+                                   "Endpoint concurrency limit from the endpoint table", labels=["endpoint"])
+        for name, endpoint in ENDPOINTS.items():
+            family.add_metric([name], endpoint.concurrency - endpoint.semaphore._value)
+            limits.add_metric([name], endpoint.concurrency)
+        yield family
+        yield limits
+
+        state = GaugeMetricFamily("tmdb_proxy_circuit_state", "Circuit state per endpoint group (0 closed, 1 half-open, 2 open)",
+                                  labels=["group"])
+        opened = CounterMetricFamily("tmdb_proxy_circuit_opened", "Times the circuit opened", labels=["group"])
+        rejected = CounterMetricFamily("tmdb_proxy_circuit_rejected", "Calls failed fast by an open circuit", labels=["group"])
+        for group, breaker in breakers.items():
+            state.add_metric([group], {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}[breaker.state])
+            opened.add_metric([group], breaker.opened)
+            rejected.add_metric([group], breaker.rejected)
+        yield state
+        yield opened
+        yield rejected
+
+        upstream = scheduler.stats()
+        yield GaugeMetricFamily("tmdb_proxy_scheduler_queue_depth", "Calls waiting for a rate limit token",
+                                value=upstream["queue_depth"])
+        yield CounterMetricFamily("tmdb_proxy_scheduler_throttled", "429 responses that paused the scheduler",
+                                  value=upstream["throttled"])
+
+def register_collector(inflight):
+    REGISTRY.register(ProxyCollector(inflight))
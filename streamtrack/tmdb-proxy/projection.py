@@ -0,0 +1,51 @@
+from fastapi import HTTPException
+import re
+
+MAX_FIELDS = 50
+FIELD_NAME_PATTERN = re.compile(r"^[a-z0-9_]+$")
+
+# Nazwane zestawy pól używane przez widoki frontendu
+FIELD_PRESETS = {
+    "card": (
+        "id", "title", "name", "poster_path", "vote_average",
+        "release_date", "first_air_date", "genre_ids", "media_type",
+    ),
+    "detail": (
+        "id", "title", "name", "original_title", "original_name", "overview", "tagline",
+        "poster_path", "backdrop_path", "vote_average", "vote_count", "release_date",
+        "first_air_date", "genres", "runtime", "episode_run_time", "number_of_seasons",
+        "number_of_episodes", "status", "homepage", "media_type",
+    ),
+}
+
+# Pola stronicowania zostają w odpowiedziach listowych niezależnie od projekcji
+LIST_FIELDS = ("page", "total_pages", "total_results")
+
+def parse_fields(fields):
+    if not fields:
+        return None
+    selected = set()
+    for name in fields.split(","):
+        name = name.strip().lower()
+        if not name:
+            continue
+        if name in FIELD_PRESETS:
+            selected.update(FIELD_PRESETS[name])
+        elif FIELD_NAME_PATTERN.match(name):
+            selected.add(name)
+        else:
+            raise HTTPException(status_code=400, detail=f"Invalid field name: {name}")
+    if len(selected) > MAX_FIELDS:
+        raise HTTPException(status_code=400, detail=f"Too many fields requested (max {MAX_FIELDS})")
+    return tuple(sorted(selected)) or None
+
+def project_item(item, fields):
+    return {k: item[k] for k in fields if k in item}
+
+def project(document, fields):
+    results = document.get("results")
+    if isinstance(results, list):
+        projected = {k: document[k] for k in LIST_FIELDS if k in document}
+        projected["results"] = [project_item(item, fields) if isinstance(item, dict) else item for item in results]
+        return projected
+    return project_item(document, fields)
@@ -0,0 +1,115 @@
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+import asyncio, heapq, itertools, os, random, time
+
+TMDB_RATE_LIMIT = float(os.getenv("TMDB_RATE_LIMIT", "40"))
+TMDB_RATE_BURST = int(os.getenv("TMDB_RATE_BURST", "40"))
+TMDB_MAX_RETRY_AFTER = float(os.getenv("TMDB_MAX_RETRY_AFTER", "10"))
+TMDB_RETRY_BASE_DELAY = float(os.getenv("TMDB_RETRY_BASE_DELAY", "0.2"))
+TMDB_RETRY_MAX_DELAY = float(os.getenv("TMDB_RETRY_MAX_DELAY", "2"))
+
+# Niższa wartość = wyższy priorytet
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 1
+PRIORITY_BACKGROUND = 2
+
+def parse_retry_after(value, default=1.0):
+    if not value:
+        return default
+    try:
+        delay = float(value)
+    except ValueError:
+        try:
+            delay = (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds()
+        except (TypeError, ValueError):
+            return default
+    return min(max(delay, 0.0), TMDB_MAX_RETRY_AFTER)
+
+def retry_delay(attempt):
+    # Wykładniczy backoff z pełnym jitterem - ponowienia z wielu żądań nie uderzają naraz
+    return random.uniform(0, min(TMDB_RETRY_MAX_DELAY, TMDB_RETRY_BASE_DELAY * 2 ** attempt))
+
+class UpstreamScheduler:
+    def __init__(self, rate=TMDB_RATE_LIMIT, burst=TMDB_RATE_BURST):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated_at = time.monotonic()
+        self.blocked_until = 0.0
+        self._queue = []
+        self._seq = itertools.count()
+        self._dispatcher = None
+        self.granted = 0
+        self.queued = 0
+        self.throttled = 0
+        self.max_queue_depth = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def _delay(self, now):
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if self.tokens < 1:
+            return (1 - self.tokens) / self.rate
+        return 0.0
+
+    def _grant(self, waited):
+        self.tokens -= 1
+        self.granted += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+
+    async def acquire(self, priority=PRIORITY_INTERACTIVE):
+        now = time.monotonic()
+        self._refill(now)
+        if not self._queue and self._delay(now) == 0:
+            self._grant(0.0)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (priority, next(self._seq), now, future))
+        self.queued += 1
+        self.max_queue_depth = max(self.max_queue_depth, len(self._queue))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        await future
+
+    async def _dispatch(self):
+        while self._queue:
+            now = time.monotonic()
+            self._refill(now)
+            delay = self._delay(now)
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            _, _, enqueued_at, future = heapq.heappop(self._queue)
+            if future.done():
+                continue
+            self._grant(now - enqueued_at)
+            future.set_result(None)
+
+    def throttle(self, retry_after):
+        # TMDB odpowiedziało 429: wstrzymujemy wszystkie zapytania na czas Retry-After
+        self.throttled += 1
+        self.tokens = 0.0
+        self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+
+    def stats(self):
+        return {
+            "rate": self.rate,
+            "burst": self.burst,
+            "tokens": round(self.tokens, 2),
+            "queue_depth": len(self._queue),
+            "max_queue_depth": self.max_queue_depth,
+            "granted": self.granted,
+            "queued": self.queued,
+            "throttled": self.throttled,
+            "avg_wait": self.total_wait / self.granted if self.granted else 0.0,
+            "max_wait": self.max_wait,
+        }
+
+scheduler = UpstreamScheduler()
@@ -0,0 +1,90 @@
+from starlette.datastructures import Headers
+from starlette.responses import Response
+import brotli, gzip, hashlib, orjson, os
+
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
+
+# Kolejność preferencji przy negocjacji Accept-Encoding
+ENCODINGS = ("br", "gzip")
+
+class EncodedBody:
+    # Zserializowana odpowiedź razem z ETagiem i skompresowanymi wariantami,
+    # liczonymi raz na wpis w cache, a nie przy każdym żądaniu.
+    __slots__ = ("body", "etag", "variants")
+
+    def __init__(self, body):
+        self.body = body
+        self.etag = f'W/"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+        self.variants = {}
+        if len(body) >= COMPRESSION_MIN_SIZE:
+            self.variants["br"] = brotli.compress(body, quality=BROTLI_QUALITY)
+            self.variants["gzip"] = gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+    @classmethod
+    def from_data(cls, data):
+        return cls(orjson.dumps(data))
+
+    @property
+    def nbytes(self):
+        return len(self.body) + sum(len(v) for v in self.variants.values())
+
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+def negotiate_encoding(accept_encoding, variants):
+    if not accept_encoding or not variants:
+        return None
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    for encoding in ENCODINGS:
+        if encoding in variants and accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+    return None
+
+class EncodedResponse(Response):
+    media_type = "application/json"
+
+    def __init__(self, encoded, max_age=0, status_code=200):
+        self.encoded = encoded
+        self.status_code = status_code
+        self.background = None
+        self.body = encoded.body
+        self.raw_headers = []
+        self.headers["content-type"] = self.media_type
+        self.headers["etag"] = encoded.etag
+        self.headers["cache-control"] = f"public, max-age={max_age}" if max_age > 0 else "no-cache"
+        self.headers["vary"] = "Accept-Encoding"
+
+    async def __call__(self, scope, receive, send):
+        request_headers = Headers(scope=scope)
+        headers = list(self.raw_headers)
+        if etag_matches(request_headers.get("if-none-match"), self.encoded.etag):
+            status_code = 304
+            body = b""
+            headers = [(k, v) for k, v in headers if k != b"content-type"]
+        else:
+            status_code = self.status_code
+            encoding = negotiate_encoding(request_headers.get("accept-encoding"), self.encoded.variants)
+            body = self.encoded.variants[encoding] if encoding else self.encoded.body
+            if encoding:
+                headers.append((b"content-encoding", encoding.encode("latin-1")))
+            headers.append((b"content-length", str(len(body)).encode("latin-1")))
+
+        await send({"type": "http.response.start", "status": status_code, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
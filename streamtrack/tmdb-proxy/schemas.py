@@ -0,0 +1,14 @@
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
+import os
+
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "100"))
+
+class MediaRef(BaseModel):
+    media_type: Literal["movie", "tv"]
+    id: int
+
+class DetailsBatchRequest(BaseModel):
+    items: List[MediaRef] = Field(..., min_length=1, max_length=BATCH_MAX_ITEMS)
+    language: str = "pl-PL"
+    fields: Optional[str] = None
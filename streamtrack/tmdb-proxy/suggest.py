@@ -0,0 +1,163 @@
+from collections import OrderedDict
+import heapq, os, unicodedata
+
+SUGGEST_MAX_TITLES = int(os.getenv("SUGGEST_MAX_TITLES", "20000"))
+SUGGEST_LIMIT = int(os.getenv("SUGGEST_LIMIT", "10"))
+# Poniżej tylu lokalnych wyników (przy dostatecznie długim zapytaniu) pytamy TMDB
+SUGGEST_MIN_RESULTS = int(os.getenv("SUGGEST_MIN_RESULTS", "3"))
+SUGGEST_UPSTREAM_MIN_LENGTH = int(os.getenv("SUGGEST_UPSTREAM_MIN_LENGTH", "3"))
+
+PREFIX_MAX_LENGTH = 12
+MAX_TOKENS = 8
+NGRAM = 3
+
+# Litery, których NFKD nie rozkłada na literę bazową i znak diakrytyczny
+FOLD = str.maketrans({"ł": "l", "ø": "o", "đ": "d", "ß": "ss", "æ": "ae", "œ": "oe"})
+
+def normalize(text):
+    text = unicodedata.normalize("NFKD", text.lower().translate(FOLD))
+    text = "".join(c if c.isalnum() else " " for c in text if not unicodedata.combining(c))
+    return " ".join(text.split())
+
+def ngrams(text):
+    return {text[i:i + NGRAM] for i in range(len(text) - NGRAM + 1)}
+
+class Suggestion:
+    __slots__ = ("key", "data", "popularity", "text", "tokens", "grams")
+
+    def __init__(self, key, data, popularity, text):
+        self.key = key
+        self.data = data
+        self.popularity = popularity
+        self.text = text
+        self.tokens = text.split()[:MAX_TOKENS]
+        self.grams = ngrams(text)
+
+    def prefixes(self):
+        return {token[:n] for token in self.tokens for n in range(1, min(len(token), PREFIX_MAX_LENGTH) + 1)}
+
+class SuggestIndex:
+    # Indeks tytułów widzianych w odpowiedziach TMDB: prefiksy słów i n-gramy całego tytułu.
+    # Ograniczony liczbą tytułów - najdawniej widziane wypadają pierwsze.
+    def __init__(self, max_titles=SUGGEST_MAX_TITLES):
+        self.max_titles = max_titles
+        self._titles = OrderedDict()
+        self._prefixes = {}
+        self._grams = {}
+        self.inserted = 0
+        self.evicted = 0
+        self.local_answers = 0
+        self.upstream_fallbacks = 0
+
+    def __len__(self):
+        return len(self._titles)
+
+    def _link(self, postings, terms, key):
+        for term in terms:
+            postings.setdefault(term, set()).add(key)
+
+    def _unlink(self, postings, terms, key):
+        for term in terms:
+            keys = postings.get(term)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del postings[term]
+
+    def _remove(self, key):
+        suggestion = self._titles.pop(key)
+        self._unlink(self._prefixes, suggestion.prefixes(), key)
+        self._unlink(self._grams, suggestion.grams, key)
+
+    def add(self, media_type, item):
+        title = item.get("title") or item.get("name")
+        if media_type not in ("movie", "tv") or not title or item.get("id") is None:
+            return
+        original = item.get("original_title") or item.get("original_name")
+        text = normalize(title if not original or original == title else f"{title} {original}")
+        if not text:
+            return
+        key = (media_type, item["id"])
+        date = item.get("release_date") or item.get("first_air_date") or ""
+        data = {
+            "id": item["id"],
+            "media_type": media_type,
+            "title": title,
+            "poster_path": item.get("poster_path"),
+            "year": date[:4] or None,
+            "vote_average": item.get("vote_average"),
+        }
+        popularity = item.get("popularity") or 0.0
+
+        existing = self._titles.get(key)
+        if existing is not None and existing.text == text:
+            existing.data = data
+            existing.popularity = popularity
+            self._titles.move_to_end(key)
+            return
+        if existing is not None:
+            self._remove(key)
+
+        suggestion = Suggestion(key, data, popularity, text)
+        self._titles[key] = suggestion
+        self._link(self._prefixes, suggestion.prefixes(), key)
+        self._link(self._grams, suggestion.grams, key)
+        self.inserted += 1
+        while len(self._titles) > self.max_titles:
+            self._remove(next(iter(self._titles)))
+            self.evicted += 1
+
+    def add_document(self, media_type, document):
+        # Listy (search, discover, similar) albo pojedynczy dokument szczegółów
+        results = document.get("results")
+        if isinstance(results, list):
+            for item in results:
+                if isinstance(item, dict):
+                    self.add(item.get("media_type", media_type), item)
+        else:
+            self.add(media_type, document)
+
+    def _prefix_matches(self, tokens):
+        matches = None
+        for token in tokens:
+            keys = self._prefixes.get(token[:PREFIX_MAX_LENGTH], set())
+            if len(token) > PREFIX_MAX_LENGTH:
+                keys = {k for k in keys if any(t.startswith(token) for t in self._titles[k].tokens)}
+            matches = keys if matches is None else matches & keys
+            if not matches:
+                return set()
+        return matches
+
+    def _substring_matches(self, text):
+        postings = sorted((self._grams.get(gram, set()) for gram in ngrams(text)), key=len)
+        if not postings or not postings[0]:
+            return set()
+        matches = set.intersection(*postings)
+        return {k for k in matches if text in self._titles[k].text}
+
+    def query(self, q, limit=SUGGEST_LIMIT):
+        text = normalize(q)
+        if not text:
+            return []
+        matches = self._prefix_matches(text.split())
+        if len(matches) < limit and len(text) >= NGRAM:
+            matches |= self._substring_matches(text)
+        best = heapq.nlargest(limit, matches, key=lambda k: self._titles[k].popularity)
+        return [self._titles[k].data for k in best]
+
+    def needs_upstream(self, q, results):
+        return len(results) < SUGGEST_MIN_RESULTS and len(normalize(q)) >= SUGGEST_UPSTREAM_MIN_LENGTH
+
+    def stats(self):
+        return {
+            "titles": len(self._titles),
+            "max_titles": self.max_titles,
+            "prefixes": len(self._prefixes),
+            "ngrams": len(self._grams),
+            "inserted": self.inserted,
+            "evicted": self.evicted,
+            "local_answers": self.local_answers,
+            "upstream_fallbacks": self.upstream_fallbacks,
+        }
+
+suggest_index = SuggestIndex()
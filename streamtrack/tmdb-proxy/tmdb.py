@@ -1,5 +1,19 @@
-from fastapi import APIRouter, HTTPException
-import httpx, os
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import Response, StreamingResponse
+from contextvars import ContextVar
+from http_client import get_client
+from cache import response_cache, make_cache_key, TTL_CLASSES, STALE_TTL_CLASSES
+from responses import EncodedBody, EncodedResponse
+from disk_cache import disk_cache
+from singleflight import SingleFlight
+from rate_limiter import scheduler, parse_retry_after, retry_delay, PRIORITY_INTERACTIVE, PRIORITY_BULK, PRIORITY_BACKGROUND
+from schemas import DetailsBatchRequest
+from projection import parse_fields, project, project_item
+from endpoints import ENDPOINTS, DETAILS, SEARCH, TITLE, TITLE_DETAILS, MEDIA_TYPES, title_details
+from suggest import suggest_index, SUGGEST_LIMIT
+from circuit_breaker import breakers, CircuitOpenError
+from metrics import UPSTREAM_DURATION, PREFETCHES, upstream_status_label
+import asyncio, httpx, orjson, os, time
 
 router = APIRouter()
 
@@ -23,337 +37,410 @@ else:
 if not TMDB_API_KEY:
     raise RuntimeError("TMDB_API_KEY is empty after attempting to load from env/file.")
 
-TMDB_API_URL = "https://api.themoviedb.org/3"
-
-@router.get("/search")
-async def search(query: str):
-  async with httpx.AsyncClient() as client:
-    response = await client.get(
-      f"{TMDB_API_URL}/search/multi",
-      params={
-        "api_key": TMDB_API_KEY,
-        "query": query,
-        "language": "pl-PL",
-      },
-    )
-    if response.status_code != 200:
-      raise HTTPException(status_code=response.status_code, detail="Error fetching data from TMDB")
-    return response.json()
-  
-@router.get("/movie/{movie_id}")
-async def get_movie(movie_id: str):
-  async with httpx.AsyncClient() as client:
-    response = await client.get(
-      f"{TMDB_API_URL}/movie/{movie_id}",
-      params={
-        "api_key": TMDB_API_KEY,
-        "language": "pl-PL",
-      },
-    )
+TMDB_API_URL = os.getenv("TMDB_API_URL", "https://api.themoviedb.org/3")
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+PAGES_MAX = int(os.getenv("PAGES_MAX", "10"))
+PAGES_CONCURRENCY = int(os.getenv("PAGES_CONCURRENCY", "4"))
+# TMDB nie zwraca stron listy powyżej 500
+TMDB_MAX_PAGE = 500
+
+inflight = SingleFlight()
+_background_tasks = set()
+
+# Ustawiany przez middleware w main.py; handlery zapisują tu status cache,
+# który trafia do nagłówka X-Cache-Status odpowiedzi.
+request_cache_status = ContextVar("request_cache_status", default=None)
+
+def mark_cache_status(status, revalidation_failed=False):
+    holder = request_cache_status.get()
+    if holder is None:
+        return
+    holder.setdefault("statuses", set()).add(status)
+    if revalidation_failed:
+        holder["revalidation_failed"] = True
+
+def index_suggestions(endpoint, path, entry):
+    # Tytuły z odpowiedzi zasilają lokalny indeks podpowiedzi (tylko przy zapisie do cache)
+    if endpoint.suggest:
+        suggest_index.add_document(endpoint.media_type or path.split("/")[1], entry.value)
+
+def is_upstream_failure(response):
+    return response is None or response.status_code == 429 or response.status_code >= 500
+
+def observe_upstream(endpoint, started, response=None, error=None):
+    UPSTREAM_DURATION.labels(endpoint.name, upstream_status_label(response, error)).observe(time.perf_counter() - started)
+
+async def fetch_upstream(endpoint, path, params, cache_key, priority=PRIORITY_INTERACTIVE):
+    client = get_client()
+    breaker = endpoint.breaker
+    # Otwarty obwód: od razu błąd, bez zajmowania slotów, tokenów i połączeń
+    breaker.before_call()
+    async with endpoint.semaphore:
+        for attempt in range(endpoint.retries + 1):
+            last_attempt = attempt == endpoint.retries
+            await scheduler.acquire(priority)
+            started = time.perf_counter()
+            try:
+                response = await client.get(
+                    f"{TMDB_API_URL}{path}", params={"api_key": TMDB_API_KEY, **params}, timeout=endpoint.timeout
+                )
+            except httpx.TransportError as e:
+                observe_upstream(endpoint, started, error=e)
+                if last_attempt:
+                    breaker.record_failure()
+                    raise
+                await asyncio.sleep(retry_delay(attempt))
+                continue
+            observe_upstream(endpoint, started, response)
+            if response.status_code == 429:
+                # Limit TMDB to nie awaria - scheduler wstrzymuje wszystkie zapytania na czas Retry-After
+                scheduler.throttle(parse_retry_after(response.headers.get("Retry-After")))
+                continue
+            if response.status_code >= 500:
+                if not last_attempt:
+                    await asyncio.sleep(retry_delay(attempt))
+                continue
+            break
+    # Do obwodu trafia jeden wynik na wywołanie, niezależnie od liczby prób
+    if response.status_code >= 500:
+        breaker.record_failure()
+    else:
+        breaker.record_success()
     if response.status_code != 200:
-      raise HTTPException(status_code=response.status_code, detail="Error fetching data from TMDB")
-    return response.json()
-
-@router.get("/genres/movie")
-async def get_movie_genres():
-    async with httpx.AsyncClient() as client:
-        response = await client.get(
-            f"{TMDB_API_URL}/genre/movie/list",
-            params={"api_key": TMDB_API_KEY, "language": "pl-PL"},
-        )
-        if response.status_code != 200:
-            raise HTTPException(status_code=response.status_code, detail="Error fetching movie genres from TMDB")
-        return response.json()
-
-@router.get("/genres/tv")
-async def get_tv_genres():
-    async with httpx.AsyncClient() as client:
-        response = await client.get(
-            f"{TMDB_API_URL}/genre/tv/list",
-            params={"api_key": TMDB_API_KEY, "language": "pl-PL"},
-        )
-        if response.status_code != 200:
-            raise HTTPException(status_code=response.status_code, detail="Error fetching TV genres from TMDB")
-        return response.json()
-
-@router.get("/providers/movie")
-async def get_movie_providers(watch_region: str = "PL"):
-    async with httpx.AsyncClient() as client:
-        response = await client.get(
-            f"{TMDB_API_URL}/watch/providers/movie",
-            params={"api_key": TMDB_API_KEY, "language": "pl-PL", "watch_region": watch_region.upper()},
-        )
-        if response.status_code != 200:
-            raise HTTPException(status_code=response.status_code, detail="Error fetching movie providers from TMDB")
-        return response.json()
-
-@router.get("/providers/tv")
-async def get_tv_providers(watch_region: str = "PL"):
-    async with httpx.AsyncClient() as client:
-        response = await client.get(
-            f"{TMDB_API_URL}/watch/providers/tv",
-            params={"api_key": TMDB_API_KEY, "language": "pl-PL", "watch_region": watch_region.upper()},
-        )
-        if response.status_code != 200:
-            raise HTTPException(status_code=response.status_code, detail="Error fetching TV providers from TMDB")
-        return response.json()
-
-@router.get("/discover/movie")
-async def discover_movies(
-    with_genres: str = None, 
-    with_watch_providers: str = None, 
-    watch_region: str = "PL",
-    page: int = 1,
-    sort_by: str = "popularity.desc"
-):
-    params = {
-        "api_key": TMDB_API_KEY,
-        "language": "pl-PL",
-        "watch_region": watch_region.upper(),
-        "page": page,
-        "sort_by": sort_by,
-        "include_adult": "false"
-    }
+        return response, None
+    raw = response.content
+    ttl_class = endpoint.ttl_class
+    entry = response_cache.set(cache_key, EncodedBody(raw), ttl_class)
+    index_suggestions(endpoint, path, entry)
+    ttl = TTL_CLASSES[ttl_class]
+    disk_cache.store(cache_key, ttl_class, raw, ttl, ttl + STALE_TTL_CLASSES[ttl_class])
+    return response, entry
 
-    if with_genres:
-        params["with_genres"] = with_genres
-    if with_watch_providers:
-        params["with_watch_providers"] = with_watch_providers
-        params["watch_region"] = watch_region.upper() 
-
-    async with httpx.AsyncClient() as client:
-        response = await client.get(f"{TMDB_API_URL}/discover/movie", params=params)
-        if response.status_code != 200:
-            raise HTTPException(status_code=response.status_code, detail="Error discovering movies from TMDB")
-        return response.json()
-
-@router.get("/discover/tv")
-async def discover_tv_shows(
-    with_genres: str = None, 
-    with_watch_providers: str = None, 
-    watch_region: str = "PL",
-    page: int = 1,
-    sort_by: str = "popularity.desc"
-):
-    params = {
-        "api_key": TMDB_API_KEY,
-        "language": "pl-PL",
-        "watch_region": watch_region.upper(),
-        "page": page,
-        "sort_by": sort_by,
-        "include_adult": "false"
-    }
+async def load_or_fetch(endpoint, path, params, cache_key, priority=PRIORITY_INTERACTIVE):
+    # Brak w pamięci: najpierw cache na dysku, dopiero potem TMDB
+    stored = await disk_cache.get(cache_key)
+    if stored is None:
+        return await fetch_upstream(endpoint, path, params, cache_key, priority)
+
+    raw, fresh_for, stale_for = stored
+    entry = response_cache.set(cache_key, EncodedBody(raw), endpoint.ttl_class, fresh_for, stale_for)
+    index_suggestions(endpoint, path, entry)
+    if fresh_for > 0:
+        return None, entry
+    try:
+        response, fetched = await fetch_upstream(endpoint, path, params, cache_key, priority)
+    except httpx.HTTPError:
+        response, fetched = None, None
+    if fetched is not None:
+        return response, fetched
+    if not is_upstream_failure(response):
+        response_cache.delete(cache_key)
+        return response, None
+    mark_cache_status("STALE", revalidation_failed=True)
+    return response, entry
 
-    if with_genres:
-        params["with_genres"] = with_genres
-    if with_watch_providers:
-        params["with_watch_providers"] = with_watch_providers
-        params["watch_region"] = watch_region.upper() 
-
-    async with httpx.AsyncClient() as client:
-        response = await client.get(f"{TMDB_API_URL}/discover/tv", params=params)
-        if response.status_code != 200:
-            raise HTTPException(status_code=response.status_code, detail="Error discovering TV shows from TMDB")
-        return response.json()
-
-@router.get("/movie/{movie_id}/watch/providers")
-async def get_movie_item_watch_providers(movie_id: int, watch_region: str = "PL"):
-    async with httpx.AsyncClient() as client:
-        response = await client.get(
-            f"{TMDB_API_URL}/movie/{movie_id}/watch/providers",
-            params={"api_key": TMDB_API_KEY},
+async def revalidate(endpoint, path, params, cache_key, entry):
+    try:
+        response, fetched = await inflight.do(
+            cache_key, lambda: fetch_upstream(endpoint, path, params, cache_key, PRIORITY_BACKGROUND)
         )
-        if response.status_code != 200:
-            return {"results": {}} 
-        
-        data = response.json()
-        region_providers = data.get("results", {}).get(watch_region.upper())
-        return region_providers if region_providers else {}
-
-@router.get("/tv/{tv_id}/watch/providers")
-async def get_tv_item_watch_providers(tv_id: int, watch_region: str = "PL"):
-    async with httpx.AsyncClient() as client:
-        response = await client.get(
-            f"{TMDB_API_URL}/tv/{tv_id}/watch/providers",
-            params={"api_key": TMDB_API_KEY},
+    except httpx.HTTPError:
+        response, fetched = None, None
+    if fetched is not None:
+        return
+    if is_upstream_failure(response):
+        entry.revalidation_failed = True
+    else:
+        response_cache.delete(cache_key)
+
+def schedule_revalidation(endpoint, path, params, cache_key, entry):
+    if cache_key in inflight:
+        return
+    task = asyncio.create_task(revalidate(endpoint, path, params, cache_key, entry))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+def lookup_cached(endpoint, path, params):
+    cache_key = make_cache_key(path, params)
+    entry = response_cache.get(cache_key, endpoint.ttl_class)
+    if entry is None:
+        return None
+    if entry.is_fresh():
+        mark_cache_status("HIT")
+    else:
+        schedule_revalidation(endpoint, path, params, cache_key, entry)
+        mark_cache_status("STALE", entry.revalidation_failed)
+    return entry
+
+async def fetch_uncached(endpoint, path, params, priority=PRIORITY_INTERACTIVE):
+    cache_key = make_cache_key(path, params)
+    mark_cache_status("MISS")
+    try:
+        response, entry = await inflight.do(
+            cache_key, lambda: load_or_fetch(endpoint, path, params, cache_key, priority)
         )
-        if response.status_code != 200:
-            return {"results": {}}
-        
-        data = response.json()
-        region_providers = data.get("results", {}).get(watch_region.upper())
-        return region_providers if region_providers else {}
-
-@router.get("/details/{media_type}/{media_id}")
-async def get_media_details(media_type: str, media_id: str, language: str = "pl-PL"):
-    if media_type not in ["movie", "tv"]:
-        raise HTTPException(status_code=400, detail="Invalid media_type. Must be 'movie' or 'tv'.")
-    
-    async with httpx.AsyncClient() as client:
-        response = await client.get(
-            f"{TMDB_API_URL}/{media_type}/{media_id}",
-            params={
-                "api_key": TMDB_API_KEY,
-                "language": language,
-            },
+    except CircuitOpenError as e:
+        raise HTTPException(
+            status_code=503, detail="TMDB is temporarily unavailable",
+            headers={"Retry-After": str(max(1, round(e.retry_after)))},
         )
-        if response.status_code != 200:
+    except httpx.TimeoutException:
+        raise HTTPException(status_code=504, detail="TMDB request timed out")
+    except httpx.HTTPError:
+        raise HTTPException(status_code=502, detail="Could not connect to TMDB")
+
+    if entry is None:
+        error_detail = endpoint.error_detail
+        if error_detail is None:
             error_detail = response.json().get("status_message", "Error fetching data from TMDB") if response.content else "Error fetching data from TMDB"
-            raise HTTPException(status_code=response.status_code, detail=error_detail)
-        return response.json()
-
-@router.get("/movie/{movie_id}/reviews")
-async def get_movie_reviews(movie_id: str, language: str = "en-US", page: int = 1):
-    async with httpx.AsyncClient() as client:
-        response = await client.get(
-            f"{TMDB_API_URL}/movie/{movie_id}/reviews",
-            params={
-                "api_key": TMDB_API_KEY,
-                "language": language,
-                "page": page,
-            },
-        )
-        if response.status_code != 200:
-            return {"results": [], "total_results": 0}
-        return response.json()
-
-@router.get("/tv/{tv_id}/reviews")
-async def get_tv_reviews(tv_id: str, language: str = "en-US", page: int = 1):
-    async with httpx.AsyncClient() as client:
-        response = await client.get(
-            f"{TMDB_API_URL}/tv/{tv_id}/reviews",
-            params={
-                "api_key": TMDB_API_KEY,
-                "language": language,
-                "page": page,
-            },
-        )
-        if response.status_code != 200:
-            return {"results": [], "total_results": 0}
-        return response.json()
-
-@router.get("/movie/{movie_id}/credits")
-async def get_movie_credits(movie_id: str):
-    async with httpx.AsyncClient() as client:
-        response = await client.get(
-            f"{TMDB_API_URL}/movie/{movie_id}/credits",
-            params={
-                "api_key": TMDB_API_KEY,
-                "language": "pl-PL",
-            },
-        )
-        if response.status_code != 200:
-            return {"cast": [], "crew": []}
-        return response.json()
-
-@router.get("/tv/{tv_id}/credits")
-async def get_tv_credits(tv_id: str):
-    async with httpx.AsyncClient() as client:
-        response = await client.get(
-            f"{TMDB_API_URL}/tv/{tv_id}/credits",
-            params={
-                "api_key": TMDB_API_KEY,
-                "language": "pl-PL",
-            },
-        )
-        if response.status_code != 200:
-            return {"cast": [], "crew": []}
-        return response.json()
-
-@router.get("/movie/{movie_id}/similar")
-async def get_similar_movies(movie_id: str, page: int = 1):
-    async with httpx.AsyncClient() as client:
-        response = await client.get(
-            f"{TMDB_API_URL}/movie/{movie_id}/similar",
-            params={
-                "api_key": TMDB_API_KEY,
-                "language": "pl-PL",
-                "page": page,
-            },
-        )
-        if response.status_code != 200:
-            return {"results": []}
-        return response.json()
-
-@router.get("/tv/{tv_id}/similar")
-async def get_similar_tv(tv_id: str, page: int = 1):
-    async with httpx.AsyncClient() as client:
-        response = await client.get(
-            f"{TMDB_API_URL}/tv/{tv_id}/similar",
-            params={
-                "api_key": TMDB_API_KEY,
-                "language": "pl-PL",
-                "page": page,
-            },
-        )
-        if response.status_code != 200:
-            return {"results": []}
-        return response.json()
-
-@router.get("/movie/{movie_id}/videos")
-async def get_movie_videos(movie_id: str):
-    async with httpx.AsyncClient() as client:
-        response = await client.get(
-            f"{TMDB_API_URL}/movie/{movie_id}/videos",
-            params={
-                "api_key": TMDB_API_KEY,
-                "language": "pl-PL",
-            },
-        )
-        if response.status_code != 200:
-            return {"results": []}
-        return response.json()
-
-@router.get("/tv/{tv_id}/videos")
-async def get_tv_videos(tv_id: str):
-    async with httpx.AsyncClient() as client:
-        response = await client.get(
-            f"{TMDB_API_URL}/tv/{tv_id}/videos",
-            params={
-                "api_key": TMDB_API_KEY,
-                "language": "pl-PL",
-            },
-        )
-        if response.status_code != 200:
-            return {"results": []}
-        return response.json()
-
-@router.get("/movie/{movie_id}/external_ids")
-async def get_movie_external_ids(movie_id: str):
-    async with httpx.AsyncClient() as client:
-        response = await client.get(
-            f"{TMDB_API_URL}/movie/{movie_id}/external_ids",
-            params={
-                "api_key": TMDB_API_KEY,
-            },
-        )
-        if response.status_code != 200:
-            return {}
-        return response.json()
-
-@router.get("/tv/{tv_id}/external_ids")
-async def get_tv_external_ids(tv_id: str):
-    async with httpx.AsyncClient() as client:
-        response = await client.get(
-            f"{TMDB_API_URL}/tv/{tv_id}/external_ids",
-            params={
-                "api_key": TMDB_API_KEY,
-            },
-        )
-        if response.status_code != 200:
-            return {}
-        return response.json()
-
-@router.get("/tv/{tv_id}")
-async def get_tv_details(tv_id: str):
-    async with httpx.AsyncClient() as client:
-        response = await client.get(
-            f"{TMDB_API_URL}/tv/{tv_id}",
-            params={
-                "api_key": TMDB_API_KEY,
-                "language": "pl-PL",
-            },
-        )
-        if response.status_code != 200:
-            raise HTTPException(status_code=response.status_code, detail="Error fetching TV details from TMDB")
-        return response.json()
\ No newline at end of file
+        raise HTTPException(status_code=response.status_code, detail=error_detail)
+    return entry
+
+async def tmdb_entry(endpoint, path, params, priority=PRIORITY_INTERACTIVE):
+    entry = lookup_cached(endpoint, path, params)
+    if entry is not None:
+        return entry
+    return await fetch_uncached(endpoint, path, params, priority)
+
+def derived_response(entry, key, build):
+    encoded = response_cache.derive(entry, key, lambda value: EncodedBody.from_data(build(value)))
+    return EncodedResponse(encoded, entry.max_age())
+
+def shaped_response(endpoint, entry, query, fields, part=None):
+    # part: None - cały dokument, TITLE_DETAILS - dokument /title bez dołączonych sekcji,
+    # inna wartość - jedna dołączona sekcja (credits, videos, ...)
+    args = tuple(query[name] for name in endpoint.local)
+    if part is None and endpoint.reshape is None and not fields:
+        # Ciało odpowiedzi wysyłane prosto z cache (z ETagiem i gotową kompresją)
+        return EncodedResponse(entry.encoded, entry.max_age())
+
+    def build(value):
+        if part == TITLE_DETAILS:
+            value = title_details(value)
+        elif part is not None:
+            value = value[part]
+        if endpoint.reshape is not None:
+            value = endpoint.reshape(value, *args)
+        # Projekcje liczone na już sparsowanym dokumencie - wiele zestawów pól, jedno zapytanie do TMDB
+        return project(value, fields) if fields else value
+
+    return derived_response(entry, (part, endpoint.reshape, args, fields), build)
+
+async def tmdb_response(endpoint, path, query, fields=None, priority=PRIORITY_INTERACTIVE):
+    try:
+        entry = await tmdb_entry(endpoint, path, endpoint.upstream_params(query), priority)
+    except HTTPException:
+        if endpoint.fallback is None:
+            raise
+        return EncodedResponse(EncodedBody.from_data(endpoint.fallback))
+    return shaped_response(endpoint, entry, query, fields)
+
+def cached_title(media_type, media_id, language="pl-PL"):
+    # Dokument /title (append_to_response), jeśli jest już w cache
+    path = TITLE.upstream_path({"media_type": media_type, "media_id": media_id})
+    params = TITLE.upstream_params({"language": language})
+    if make_cache_key(path, params) not in response_cache:
+        return None
+    return lookup_cached(TITLE, path, params)
+
+def cached_title_response(endpoint, media_type, media_id, query, fields=None):
+    # Sekcje zwykłych tras serwowane z dokumentu /title, gdy ten jest już w cache
+    title = cached_title(media_type, media_id, query.get("language", "pl-PL"))
+    if title is None:
+        return None
+    part = endpoint.title_part
+    if part != TITLE_DETAILS and title.value.get(part) is None:
+        return None
+    return shaped_response(endpoint, title, query, fields, part)
+
+def parse_pages(pages):
+    # "3" albo "2-5"; zakres ograniczony do PAGES_MAX stron
+    first, _, last = pages.partition("-")
+    try:
+        first = int(first)
+        last = int(last) if last else first
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid pages range. Use e.g. pages=1-5.")
+    if first < 1 or last < first or last > TMDB_MAX_PAGE:
+        raise HTTPException(status_code=400, detail=f"Invalid pages range. Pages must be within 1-{TMDB_MAX_PAGE}.")
+    if last - first + 1 > PAGES_MAX:
+        raise HTTPException(status_code=400, detail=f"Too many pages requested (max {PAGES_MAX})")
+    return range(first, last + 1)
+
+def prefetch_page(endpoint, path, query, page):
+    # Spekulatywnie ładujemy do cache stronę, o którą klient najpewniej poprosi za chwilę
+    if page > TMDB_MAX_PAGE:
+        return
+    params = endpoint.upstream_params({**query, "page": page})
+    cache_key = make_cache_key(path, params)
+    if cache_key in response_cache or cache_key in inflight:
+        return
+    PREFETCHES.labels(endpoint.name).inc()
+    task = asyncio.create_task(
+        inflight.do(cache_key, lambda: load_or_fetch(endpoint, path, params, cache_key, PRIORITY_BACKGROUND))
+    )
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+def pages_response(endpoint, path, query, fields, pages):
+    semaphore = asyncio.Semaphore(PAGES_CONCURRENCY)
+
+    async def fetch_page(page):
+        async with semaphore:
+            return await tmdb_entry(endpoint, path, endpoint.upstream_params({**query, "page": page}))
+
+    def page_line(page, document, seen):
+        results = []
+        for item in document.get("results", []):
+            # Ten sam tytuł potrafi wrócić na kolejnej stronie, gdy ranking TMDB się przesunie
+            if item.get("id") in seen:
+                continue
+            seen.add(item.get("id"))
+            results.append(project_item(item, fields) if fields else item)
+        line = {
+            "page": page,
+            "total_pages": document.get("total_pages"),
+            "total_results": document.get("total_results"),
+            "results": results,
+        }
+        return orjson.dumps(line) + b"\n"
+
+    async def stream():
+        tasks = [asyncio.ensure_future(fetch_page(page)) for page in pages]
+        seen = set()
+        try:
+            # Strony wysyłane po kolei, choć pobierane równolegle
+            for page, task in zip(pages, tasks):
+                try:
+                    entry = await task
+                except HTTPException as e:
+                    yield orjson.dumps({"page": page, "error": {"status_code": e.status_code, "detail": e.detail}}) + b"\n"
+                    continue
+                yield page_line(page, entry.value, seen)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    prefetch_page(endpoint, path, query, pages[-1] + 1)
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+async def serve(endpoint, args):
+    path_args = {name: args.pop(name) for name in endpoint.path_params}
+    media_type = path_args.get("media_type", endpoint.media_type)
+    if "media_type" in path_args and media_type not in MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="Invalid media_type. Must be 'movie' or 'tv'.")
+    fields = parse_fields(args.pop("fields", None))
+    pages = args.pop("pages", None)
+    query = endpoint.normalize(args)
+    path = endpoint.upstream_path(path_args)
+
+    if pages:
+        return pages_response(endpoint, path, query, fields, parse_pages(pages))
+    # Dalsze strony list nie są częścią dokumentu /title
+    if endpoint.title_part is not None and query.get("page", 1) == 1:
+        response = cached_title_response(endpoint, media_type, path_args["media_id"], query, fields)
+        if response is not None:
+            return response
+    response = await tmdb_response(endpoint, path, query, fields)
+    if endpoint.paged:
+        prefetch_page(endpoint, path, query, query["page"] + 1)
+    return response
+
+def add_endpoint_route(router, endpoint):
+    async def handler(**kwargs):
+        return await serve(endpoint, kwargs)
+
+    handler.__name__ = endpoint.name
+    handler.__signature__ = endpoint.signature()
+    router.add_api_route(endpoint.route, handler, methods=["GET"], name=endpoint.name)
+
+@router.get("/cache/stats")
+async def get_cache_stats():
+    return {
+        **response_cache.stats(),
+        "in_flight": len(inflight),
+        "coalesced": inflight.coalesced,
+        "disk": disk_cache.stats(),
+    }
+
+@router.get("/upstream/stats")
+async def get_upstream_stats():
+    return {**scheduler.stats(), "circuits": {group: breaker.stats() for group, breaker in breakers.items()}}
+
+@router.get("/suggest/stats")
+async def get_suggest_stats():
+    return suggest_index.stats()
+
+@router.get("/search/suggest")
+async def search_suggest(q: str, limit: int = Query(SUGGEST_LIMIT, ge=1, le=50)):
+    # Podpowiedzi z lokalnego indeksu; TMDB tylko gdy lokalnie jest za mało trafień
+    results = suggest_index.query(q, limit)
+    source = "local"
+    if suggest_index.needs_upstream(q, results):
+        suggest_index.upstream_fallbacks += 1
+        try:
+            entry = await tmdb_entry(SEARCH, SEARCH.upstream_path({}), SEARCH.upstream_params({"query": q}))
+        except HTTPException:
+            entry = None
+        if entry is not None:
+            # Trafienie w cache /search nie przechodzi przez zapis, więc indeksujemy tutaj
+            suggest_index.add_document(None, entry.value)
+            results = suggest_index.query(q, limit)
+            source = "upstream"
+    else:
+        suggest_index.local_answers += 1
+    return Response(orjson.dumps({"query": q, "source": source, "results": results}), media_type="application/json")
+
+# Wszystkie trasy GET przekazywane do TMDB powstają z tabeli w endpoints.py
+for endpoint in ENDPOINTS.values():
+    add_endpoint_route(router, endpoint)
+
+@router.post("/details/batch")
+async def get_media_details_batch(batch: DetailsBatchRequest):
+    params = DETAILS.upstream_params({"language": batch.language})
+    fields = parse_fields(batch.fields)
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    def item_path(item):
+        return DETAILS.upstream_path({"media_type": item.media_type, "media_id": item.id})
+
+    def batch_line(item, entry=None, error=None):
+        line = {"media_type": item.media_type, "id": item.id}
+        if error is not None:
+            line["error"] = error
+        elif fields:
+            line["data"] = project(entry.value, fields)
+        else:
+            # Surowe bajty z TMDB wklejane bez ponownego parsowania
+            prefix = orjson.dumps(line)[:-1]
+            return prefix + b',"data":' + entry.encoded.body + b"}\n"
+        return orjson.dumps(line) + b"\n"
+
+    async def fetch_item(item):
+        async with semaphore:
+            try:
+                entry = await fetch_uncached(DETAILS, item_path(item), params, priority=PRIORITY_BULK)
+                return item, entry, None
+            except HTTPException as e:
+                return item, None, {"status_code": e.status_code, "detail": e.detail}
+
+    async def stream():
+        misses = []
+        for item in batch.items:
+            cached = lookup_cached(DETAILS, item_path(item), params)
+            if cached is not None:
+                yield batch_line(item, cached)
+            else:
+                misses.append(item)
+
+        tasks = [asyncio.ensure_future(fetch_item(item)) for item in misses]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                item, entry, error = await next_done
+                yield batch_line(item, entry, error)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
@@ -0,0 +1,71 @@
+from cache import response_cache, make_cache_key
+from rate_limiter import PRIORITY_BACKGROUND
+from endpoints import ENDPOINTS, MEDIA_TYPES
+from tmdb import inflight, fetch_upstream, load_or_fetch
+import asyncio, os, time
+
+WARMER_ENABLED = os.getenv("WARMER_ENABLED", "true").lower() == "true"
+WARMER_REGIONS = [r.strip().upper() for r in os.getenv("WARMER_REGIONS", "PL").split(",") if r.strip()]
+WARMER_DISCOVER_PAGES = int(os.getenv("WARMER_DISCOVER_PAGES", "3"))
+WARMER_INTERVAL = int(os.getenv("WARMER_INTERVAL", "300"))
+
+warmer_state = {
+    "ready": not WARMER_ENABLED,
+    "runs": 0,
+    "last_run_at": None,
+    "last_run_duration": None,
+    "last_refreshed": 0,
+    "last_errors": 0,
+}
+
+def warm_target(name, query=None):
+    endpoint = ENDPOINTS[name]
+    return endpoint, endpoint.upstream_path({}), endpoint.upstream_params(query)
+
+def warm_targets():
+    targets = [warm_target(f"genres_{media_type}") for media_type in MEDIA_TYPES]
+    for region in WARMER_REGIONS:
+        for media_type in MEDIA_TYPES:
+            targets.append(warm_target(f"providers_{media_type}", {"watch_region": region}))
+            for page in range(1, WARMER_DISCOVER_PAGES + 1):
+                targets.append(warm_target(f"discover_{media_type}", {"watch_region": region, "page": page}))
+    return targets
+
+async def refresh(endpoint, path, params):
+    # Odświeżamy tylko wpisy, które wygasną przed kolejnym przebiegiem
+    cache_key = make_cache_key(path, params)
+    if not response_cache.expires_within(cache_key, WARMER_INTERVAL * 1.5):
+        return False
+    # Wpis w pamięci i na dysku wygasa w tym samym momencie - kopia z dysku nie przesunęłaby
+    # terminu. Dysk czytamy tylko wtedy, gdy klucza w pamięci nie ma (np. po restarcie).
+    fetch = fetch_upstream if cache_key in response_cache else load_or_fetch
+    _, data = await inflight.do(
+        cache_key, lambda: fetch(endpoint, path, params, cache_key, PRIORITY_BACKGROUND)
+    )
+    if data is None:
+        raise RuntimeError(f"TMDB returned an error for {path}")
+    return True
+
+async def warm_once():
+    started = time.monotonic()
+    results = await asyncio.gather(
+        *(refresh(endpoint, path, params) for endpoint, path, params in warm_targets()),
+        return_exceptions=True,
+    )
+    warmer_state["runs"] += 1
+    warmer_state["last_run_at"] = time.time()
+    warmer_state["last_run_duration"] = time.monotonic() - started
+    warmer_state["last_refreshed"] = sum(1 for r in results if r is True)
+    warmer_state["last_errors"] = sum(1 for r in results if isinstance(r, Exception))
+    # Gotowość po pierwszym przebiegu, także przy błędach - inaczej awaria TMDB
+    # odcięłaby od ruchu wszystkie pody, również te z danymi w cache.
+    warmer_state["ready"] = True
+
+async def run_warmer():
+    while True:
+        try:
+            await warm_once()
+        except Exception as e:
+            print(f"Cache warmer run failed: {e}")
+            warmer_state["ready"] = True
+        await asyncio.sleep(WARMER_INTERVAL)